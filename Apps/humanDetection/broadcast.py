@@ -0,0 +1,184 @@
+import asyncio
+import fractions
+import time
+import av
+from av.video.frame import PictureType
+from aiortc import RTCRtpSender, VideoStreamTrack
+from aiortc.mediastreams import MediaStreamError, VIDEO_CLOCK_RATE, VIDEO_TIME_BASE
+
+
+def prefer_h264(transceiver):
+    # relayed packets are H264, the peer must not negotiate anything else
+    codecs = RTCRtpSender.getCapabilities('video').codecs
+    transceiver.setCodecPreferences([c for c in codecs if c.mimeType in ('video/H264', 'video/rtx')])
+
+
+class BroadcastTrack(VideoStreamTrack):
+    # hands the shared encoded packets to one RTCRtpSender, which packetizes
+    # them through its encoder's pack() instead of encoding again
+    def __init__(self, broadcaster, queue_size=4):
+        super().__init__()
+        self.broadcaster = broadcaster
+        self.queue = asyncio.Queue(queue_size)
+        self.waiting_keyframe = True
+        self.dropped = 0
+
+    def attach(self, sender):
+        # the sender answers a viewer's PLI/FIR by flagging its own encoder,
+        # which relayed packets never pass through, so the request goes to
+        # the shared one instead
+        sender._send_keyframe = lambda: self.broadcaster.request_keyframe(viewer=True)
+
+    def deliver(self, packet):
+        if self.waiting_keyframe:
+            if not packet.is_keyframe:
+                return
+            self.waiting_keyframe = False
+        if self.queue.full():
+            # a gap in the inter frames corrupts the picture, restart at a keyframe
+            self.dropped += self.queue.qsize()
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.waiting_keyframe = True
+            self.broadcaster.request_keyframe()
+            return
+        self.queue.put_nowait(packet)
+
+    async def recv(self):
+        if self.readyState != 'live':
+            raise MediaStreamError
+        packet = await self.queue.get()
+        if packet is None:
+            raise MediaStreamError
+        return packet
+
+    def stop(self):
+        if self.readyState == 'live':
+            self.broadcaster.unsubscribe(self)
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(None)
+        super().stop()
+
+
+class CameraBroadcaster:
+    def __init__(self, camera_id, frame_manager, convert, bitrate=1000000, keyframe_interval=2.0,
+                 idle_timeout=1.0, on_idle=None, on_sent=None, keyframe_min_interval=0.5):
+        self.camera_id = camera_id
+        self.frame_manager = frame_manager
+        self.convert = convert
+        self.bitrate = bitrate
+        self.keyframe_interval = keyframe_interval
+        self.keyframe_min_interval = keyframe_min_interval
+        self.idle_timeout = idle_timeout
+        self.on_idle = on_idle
+        self.on_sent = on_sent
+        self.subscribers = set()
+        self.codec = None
+        self.task = None
+        self.force_keyframe = True
+        self.viewer_keyframe = False
+        self.last_keyframe = 0.0
+        self.start = None
+        self.last_pts = -1
+        self.frames_encoded = 0
+        self.bytes_encoded = 0
+
+    def subscribe(self):
+        # must be called on the event loop the peer connections run on
+        track = BroadcastTrack(self)
+        self.subscribers.add(track)
+        self.request_keyframe()
+        if self.task is None:
+            self.task = asyncio.ensure_future(self._run())
+        return track
+
+    def unsubscribe(self, track):
+        self.subscribers.discard(track)
+        if not self.subscribers and self.task is not None:
+            self.task.cancel()
+            self.task = None
+            if self.on_idle is not None:
+                self.on_idle(self)
+
+    def request_keyframe(self, viewer=False):
+        # every viewer shares the keyframes, requests from viewers are held
+        # until keyframe_min_interval after the last one so a lossy link
+        # cannot make the encoder send only keyframes
+        if viewer:
+            self.viewer_keyframe = True
+        else:
+            self.force_keyframe = True
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        version = None
+        while self.subscribers:
+            previous = version
+            signal = self.frame_manager.signals.get(self.camera_id)
+            if signal is not None:
+                await signal.wait(version, self.idle_timeout)
+            else:
+                await asyncio.sleep(self.idle_timeout)
+            version, frame = self.frame_manager.latest(self.camera_id, self.convert)
+            try:
+                packets = await loop.run_in_executor(None, self._encode, frame)
+            except av.FFmpegError as e:
+                print(f"Broadcast encode error camera {self.camera_id}: {e}")
+                self.codec = None
+                continue
+            for packet in packets:
+                for track in list(self.subscribers):
+                    track.deliver(packet)
+            if packets and version != previous and self.on_sent is not None:
+                self.on_sent(self.camera_id, version)
+
+    def _create_codec(self, width, height):
+        codec = av.CodecContext.create('libx264', 'w')
+        codec.width = width
+        codec.height = height
+        codec.bit_rate = self.bitrate
+        codec.pix_fmt = 'yuv420p'
+        codec.framerate = fractions.Fraction(30, 1)
+        codec.time_base = VIDEO_TIME_BASE
+        # same profile aiortc's own H264 encoder negotiates
+        codec.options = {'level': '31', 'tune': 'zerolatency'}
+        codec.profile = 'Baseline'
+        return codec
+
+    def _encode(self, frame):
+        now = time.time()
+        if self.start is None:
+            self.start = now
+        if self.codec is None or (frame.width, frame.height) != (self.codec.width, self.codec.height):
+            self.codec = self._create_codec(frame.width, frame.height)
+            self.force_keyframe = True
+
+        frame = frame.reformat(format='yuv420p')
+        since = now - self.last_keyframe
+        if (self.force_keyframe or since >= self.keyframe_interval
+                or (self.viewer_keyframe and since >= self.keyframe_min_interval)):
+            frame.pict_type = PictureType.I
+            self.force_keyframe = False
+            self.viewer_keyframe = False
+            self.last_keyframe = now
+        else:
+            frame.pict_type = PictureType.NONE
+        self.last_pts = max(int((now - self.start) * VIDEO_CLOCK_RATE), self.last_pts + 1)
+        frame.pts = self.last_pts
+        frame.time_base = VIDEO_TIME_BASE
+
+        packets = self.codec.encode(frame)
+        for packet in packets:
+            packet.time_base = VIDEO_TIME_BASE
+            self.bytes_encoded += packet.size
+        self.frames_encoded += 1
+        return packets
+
+    def stats(self):
+        return {
+            'subscribers': len(self.subscribers),
+            'frames_encoded': self.frames_encoded,
+            'bytes_encoded': self.bytes_encoded,
+            'dropped': sum(track.dropped for track in self.subscribers)
+        }
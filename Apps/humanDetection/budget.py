@@ -0,0 +1,71 @@
+# cheapest last: detection scale, HOG winStride, pyramid scale factor,
+# frames skipped between detections
+QUALITY_LEVELS = [
+    {'scale': 1.0, 'win_stride': (8, 8), 'pyramid_scale': 1.05, 'skip': 0},
+    {'scale': 1.0, 'win_stride': (8, 8), 'pyramid_scale': 1.1, 'skip': 0},
+    {'scale': 0.75, 'win_stride': (8, 8), 'pyramid_scale': 1.1, 'skip': 0},
+    {'scale': 0.75, 'win_stride': (16, 16), 'pyramid_scale': 1.15, 'skip': 0},
+    {'scale': 0.5, 'win_stride': (16, 16), 'pyramid_scale': 1.2, 'skip': 1},
+    {'scale': 0.5, 'win_stride': (16, 16), 'pyramid_scale': 1.25, 'skip': 2},
+    {'scale': 0.5, 'win_stride': (16, 16), 'pyramid_scale': 1.3, 'skip': 4},
+]
+
+
+class FrameBudgetController:
+    def __init__(self, target_fps=15, cpu_share=0.6, smoothing=0.1, headroom=0.6, cooldown=30):
+        self.target_fps = target_fps
+        self.budget = cpu_share / target_fps
+        self.smoothing = smoothing
+        self.headroom = headroom
+        self.cooldown = cooldown
+        self.level = 0
+        self.average = None
+        self.since_change = 0
+        self.last_step = 0
+        self.down_cooldown = cooldown
+        self.skipped = 0
+
+    def settings(self):
+        return QUALITY_LEVELS[self.level]
+
+    def skip_frame(self):
+        if self.skipped < self.settings()['skip']:
+            self.skipped += 1
+            return True
+        self.skipped = 0
+        return False
+
+    def record(self, elapsed):
+        if self.average is None:
+            self.average = elapsed
+        else:
+            self.average += self.smoothing * (elapsed - self.average)
+        self.since_change += 1
+        if self.since_change < self.cooldown:
+            return
+
+        if self.average > self.budget and self.level < len(QUALITY_LEVELS) - 1:
+            # a quality increase that did not fit: wait longer before retrying
+            if self.last_step < 0:
+                self.down_cooldown = min(self.down_cooldown * 2, self.cooldown * 64)
+            self._change(1)
+        elif (self.average < self.budget * self.headroom and self.level > 0
+              and self.since_change >= self.down_cooldown):
+            self._change(-1)
+
+    def _change(self, step):
+        self.level += step
+        self.last_step = step
+        self.since_change = 0
+        self.skipped = 0
+        # the running average belongs to the old level, start over
+        self.average = None
+
+    def stats(self):
+        return {
+            'level': self.level,
+            'budget_ms': self.budget * 1000,
+            'average_ms': (self.average or 0.0) * 1000,
+            **self.settings()
+        }
+
@@ -1,77 +1,233 @@
-
 import numpy as np
 from collections import OrderedDict
 
+try:
+    from scipy.optimize import linear_sum_assignment
+except ImportError:
+    linear_sum_assignment = None
+
+# stands in for gated pairs so the optimal solver never prefers them
+GATE_COST = 1e12
+
+
 class CentroidTracker:
-    def __init__(self, max_disappeared=50):
+    arrays = ('ids', 'centroids', 'disappeared_counts')
+
+    def __init__(self, max_disappeared=50, max_distance=None, matching='greedy', capacity=64):
         self.next_object_id = 0
-        self.objects = OrderedDict()
-        self.disappeared = OrderedDict()
         self.max_disappeared = max_disappeared
-        self.previousPositions = {} 
+        self.max_distance = np.inf if not max_distance else float(max_distance)
+        self.matching = matching
+        self.count = 0
+        self.ids = np.empty(capacity, dtype=np.int64)
+        self.centroids = np.empty((capacity, 2), dtype=np.float64)
+        self.disappeared_counts = np.empty(capacity, dtype=np.int32)
+        self._dx = np.empty((capacity, capacity))
+        self._dy = np.empty((capacity, capacity))
+        self.deregister_listeners = []
+
+    @property
+    def objects(self):
+        return OrderedDict(zip(self.ids[:self.count].tolist(),
+                               map(tuple, self.centroids[:self.count].astype(int).tolist())))
+
+    @property
+    def disappeared(self):
+        return OrderedDict(zip(self.ids[:self.count].tolist(), self.disappeared_counts[:self.count].tolist()))
+
+    def __len__(self):
+        return self.count
+
+    def active(self):
+        return self.ids[:self.count], self.centroids[:self.count]
+
+    def observed(self):
+        # tracks matched to a detection on the last update, the others are
+        # only predicted
+        return self.disappeared_counts[:self.count] == 0
+
+    def move(self, centroids):
+        self.centroids[:self.count] = centroids
+
+    def _reserve(self, size):
+        capacity = len(self.ids)
+        if size <= capacity:
+            return
+        while capacity < size:
+            capacity *= 2
+        for name in self.arrays:
+            old = getattr(self, name)
+            new = np.empty((capacity,) + old.shape[1:], dtype=old.dtype)
+            new[:self.count] = old[:self.count]
+            setattr(self, name, new)
 
     def register(self, centroid):
-        self.objects[self.next_object_id] = centroid
-        self.disappeared[self.next_object_id] = 0
-        self.next_object_id += 1
+        self.register_many(np.asarray(centroid, dtype=np.float64).reshape(1, 2))
+
+    def register_many(self, centroids):
+        n = len(centroids)
+        if n == 0:
+            return
+        self._reserve(self.count + n)
+        end = self.count + n
+        self.ids[self.count:end] = np.arange(self.next_object_id, self.next_object_id + n)
+        self.centroids[self.count:end] = centroids
+        self.disappeared_counts[self.count:end] = 0
+        self.count = end
+        self.next_object_id += n
 
     def deregister(self, object_id):
-        if object_id in self.objects:
-            del self.objects[object_id]
-        if object_id in self.disappeared:
-            del self.disappeared[object_id]
+        self._remove(self.ids[:self.count] == object_id)
+
+    def _remove(self, mask):
+        if not mask.any():
+            return
+        removed = self.ids[:self.count][mask]
+        for listener in self.deregister_listeners:
+            listener(removed)
+        keep = ~mask
+        n = int(keep.sum())
+        for name in self.arrays:
+            array = getattr(self, name)
+            array[:n] = array[:self.count][keep]
+        self.count = n
+
+    def _expire(self):
+        self._remove(self.disappeared_counts[:self.count] > self.max_disappeared)
+
+    def _distances(self, tracks, points):
+        rows, cols = len(tracks), len(points)
+        if self._dx.shape[0] < rows or self._dx.shape[1] < cols:
+            shape = (max(rows, self._dx.shape[0]), max(cols, self._dx.shape[1]))
+            self._dx = np.empty(shape)
+            self._dy = np.empty(shape)
+        dx = np.subtract.outer(tracks[:, 0], points[:, 0], out=self._dx[:rows, :cols])
+        dy = np.subtract.outer(tracks[:, 1], points[:, 1], out=self._dy[:rows, :cols])
+        # squared distances keep the greedy order and skip the sqrt
+        np.multiply(dx, dx, out=dx)
+        np.multiply(dy, dy, out=dy)
+        return np.add(dx, dy, out=dx)
+
+    def _match(self, distances):
+        if self.matching == 'hungarian':
+            return optimal_match(distances, self.max_distance ** 2)
+        return greedy_match(distances, self.max_distance ** 2)
+
+    def _predict(self):
+        return self.centroids[:self.count]
+
+    def _correct(self, rows, points):
+        self.centroids[rows] = points
 
     def update(self, input_centroids):
         if input_centroids is None:
             input_centroids = []
 
-        input_centroids = list(input_centroids)
-
-        if len(input_centroids) == 0:
-            for object_id in list(self.disappeared.keys()):
-                self.disappeared[object_id] += 1
-                if self.disappeared[object_id] > self.max_disappeared:
-                    self.deregister(object_id)
-            return self.objects
-
-        if len(self.objects) == 0:
-            for centroid in input_centroids:
-                self.register(centroid)
-            return self.objects
-        object_ids = list(self.objects.keys())
-        object_centroids = list(self.objects.values())
-        D = np.linalg.norm(
-            np.array(object_centroids)[:, np.newaxis] - np.array(input_centroids),
-            axis=2
-        )
-
-        rows = D.min(axis=1).argsort()
-        cols = D.argmin(axis=1)[rows]
-
-        used_rows = set()
-        used_cols = set()
-
-        for (row, col) in zip(rows, cols):
-            if row in used_rows or col in used_cols:
-                continue
-
-            object_id = object_ids[row]
-            self.objects[object_id] = input_centroids[col]
-            self.disappeared[object_id] = 0
-
-            used_rows.add(row)
-            used_cols.add(col)
-
-        unused_rows = set(range(D.shape[0])) - used_rows
-        unused_cols = set(range(D.shape[1])) - used_cols
-
-        for row in unused_rows:
-            object_id = object_ids[row]
-            self.disappeared[object_id] += 1
-            if self.disappeared[object_id] > self.max_disappeared:
-                self.deregister(object_id)
-
-        for col in unused_cols:
-            self.register(input_centroids[col])
-
-        return self.objects
+        points = np.asarray(input_centroids, dtype=np.float64).reshape(-1, 2)
+        count = self.count
+        predicted = self._predict()
+
+        if len(points) == 0:
+            self.disappeared_counts[:count] += 1
+            self._expire()
+            return self.active()
+
+        if count == 0:
+            self.register_many(points)
+            return self.active()
+
+        distances = self._distances(predicted, points)
+        rows, cols = self._match(distances)
+
+        self.disappeared_counts[:count] += 1
+        self.disappeared_counts[rows] = 0
+        self._correct(rows, points[cols])
+
+        unmatched = np.ones(len(points), dtype=bool)
+        unmatched[cols] = False
+        self._expire()
+        self.register_many(points[unmatched])
+
+        return self.active()
+
+
+def greedy_match(distances, max_distance=np.inf):
+    # repeatedly accept mutually nearest pairs, which yields the same result
+    # as taking pairs in order of increasing distance
+    distances = np.where(distances <= max_distance, distances, np.inf)
+    row_index = np.arange(distances.shape[0])
+    matched_rows = []
+    matched_cols = []
+    while True:
+        best_cols = distances.argmin(axis=1)
+        best_rows = distances.argmin(axis=0)
+        mutual = (best_rows[best_cols] == row_index) & np.isfinite(distances[row_index, best_cols])
+        if not mutual.any():
+            break
+        rows = row_index[mutual]
+        cols = best_cols[mutual]
+        matched_rows.append(rows)
+        matched_cols.append(cols)
+        distances[rows, :] = np.inf
+        distances[:, cols] = np.inf
+
+    if not matched_rows:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    return np.concatenate(matched_rows), np.concatenate(matched_cols)
+
+
+def optimal_match(distances, max_distance=np.inf):
+    cost = np.where(distances <= max_distance, distances, GATE_COST)
+    if linear_sum_assignment is not None:
+        rows, cols = linear_sum_assignment(cost)
+    else:
+        rows, cols = hungarian(cost)
+    valid = distances[rows, cols] <= max_distance
+    return rows[valid], cols[valid]
+
+
+def hungarian(cost):
+    cost = np.asarray(cost, dtype=np.float64)
+    transposed = cost.shape[0] > cost.shape[1]
+    if transposed:
+        cost = cost.T
+    n, m = cost.shape
+
+    # shortest augmenting path with potentials, columns are 1-based and
+    # column 0 is the virtual start of every augmentation
+    u = np.zeros(n + 1)
+    v = np.zeros(m + 1)
+    owner = np.zeros(m + 1, dtype=np.int64)
+    way = np.zeros(m + 1, dtype=np.int64)
+    for i in range(1, n + 1):
+        owner[0] = i
+        j0 = 0
+        minv = np.full(m + 1, np.inf)
+        used = np.zeros(m + 1, dtype=bool)
+        while True:
+            used[j0] = True
+            i0 = owner[j0]
+            free = np.flatnonzero(~used)
+            reduced = cost[i0 - 1, free - 1] - u[i0] - v[free]
+            better = reduced < minv[free]
+            minv[free[better]] = reduced[better]
+            way[free[better]] = j0
+            j1 = free[np.argmin(minv[free])]
+            delta = minv[j1]
+            u[owner[used]] += delta
+            v[used] -= delta
+            minv[~used] -= delta
+            j0 = j1
+            if owner[j0] == 0:
+                break
+        while j0:
+            j1 = way[j0]
+            owner[j0] = owner[j1]
+            j0 = j1
+
+    cols = np.flatnonzero(owner[1:])
+    rows = owner[1:][cols] - 1
+    if transposed:
+        rows, cols = cols, rows
+    order = np.argsort(rows)
+    return rows[order], cols[order]
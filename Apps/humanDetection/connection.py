@@ -0,0 +1,133 @@
+import random
+import threading
+import time
+
+
+class CameraConnection:
+    # owns the source of one capture thread: opens it with backoff, reopens
+    # it when the stream ends or stalls, and times the first frame
+    def __init__(self, camera_id, open_source, base_delay=0.5, max_delay=30.0, stall_timeout=10.0):
+        self.camera_id = camera_id
+        self.open_source = open_source
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.stall_timeout = stall_timeout
+        self.cap = None
+        self.state = 'connecting'
+        self.failures = 0
+        self.attempts = 0
+        self.reconnects = 0
+        self.stalls = 0
+        self.created = time.monotonic()
+        self.connected_at = None
+        self.last_frame = None
+        self.time_to_first_frame = None
+        self.stall_detected = False
+        self.wakeup = threading.Event()
+
+    def backoff(self):
+        # full jitter keeps cameras that dropped together from retrying together
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** self.failures))
+
+    def connect(self, running):
+        while running():
+            self.attempts += 1
+            try:
+                self.cap = self.open_source()
+            except Exception as e:
+                delay = self.backoff()
+                self.failures += 1
+                print(f"Cannot open camera {self.camera_id}, retrying in {delay:.1f}s: {e}")
+                self.wakeup.wait(delay)
+                continue
+            # the backoff only starts over once frames arrive, see frame()
+            self.state = 'live'
+            self.connected_at = time.monotonic()
+            self.stall_detected = False
+            return self.cap
+        return None
+
+    def reconnect(self, running):
+        self.release()
+        self.reconnects += 1
+        self.state = 'reconnecting'
+        self.wakeup.wait(self.backoff())
+        self.failures += 1
+        return self.connect(running)
+
+    def frame(self):
+        now = time.monotonic()
+        if self.time_to_first_frame is None:
+            self.time_to_first_frame = now - self.created
+            print(f"Camera {self.camera_id} first frame after {self.time_to_first_frame:.2f}s")
+        self.last_frame = now
+        # a stream that delivers frames again is healthy, start the backoff over
+        self.failures = 0
+
+    def check(self, now):
+        if self.state != 'live' or self.stall_detected:
+            return False
+        since = self.last_frame if self.last_frame is not None else self.connected_at
+        if now - since > self.stall_timeout:
+            self.stall_detected = True
+            self.stalls += 1
+            cap = self.cap
+            if cap is not None:
+                # the capture loop may be inside a grab that never returns a
+                # frame, make it return so the loop can reconnect
+                cap.interrupt()
+            return True
+        return False
+
+    def release(self):
+        if self.cap is not None:
+            try:
+                self.cap.release()
+            except Exception as e:
+                print(f"Error releasing camera {self.camera_id}: {e}")
+            self.cap = None
+
+    def close(self):
+        self.state = 'closed'
+        self.wakeup.set()
+
+    def stats(self):
+        return {
+            'state': self.state,
+            'attempts': self.attempts,
+            'reconnects': self.reconnects,
+            'stalls': self.stalls,
+            'time_to_first_frame': round(self.time_to_first_frame, 3) if self.time_to_first_frame is not None else None
+        }
+
+
+class ConnectionWatchdog:
+    # one thread checks every camera and interrupts the capture of a stalled
+    # one, its loop then reconnects. Blocking reads are bounded by the read
+    # timeout
+    def __init__(self, interval=1.0):
+        self.interval = interval
+        self.connections = set()
+        self.lock = threading.Lock()
+        self.thread = None
+
+    def add(self, connection):
+        with self.lock:
+            self.connections.add(connection)
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name="camera-watchdog", daemon=True)
+                self.thread.start()
+
+    def remove(self, connection):
+        with self.lock:
+            self.connections.discard(connection)
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            now = time.monotonic()
+            with self.lock:
+                connections = list(self.connections)
+            for connection in connections:
+                if connection.check(now):
+                    print(f"Camera {connection.camera_id} stalled, reconnecting")
@@ -0,0 +1,137 @@
+import json
+import cv2
+import numpy as np
+from .motion_gate import merge_boxes
+
+# Geometry is stored on Camera.counting_geometry as JSON:
+#
+#   {"lines": [{"name": "door", "points": [[300, 0], [300, 480]], "invert": false}],
+#    "zones": [{"name": "lobby", "points": [[0, 0], [200, 0], [200, 200], [0, 200]]}]}
+#
+# Walking a line from its first to its last point, a track moving from the
+# positive side of the cross product to the other side is an entry, the
+# opposite move is an exit; "invert" swaps the two. The default line above
+# matches the old fixed line_position = 300, where left-to-right is an entry.
+# Entering a zone counts as an entry and leaving it as an exit.
+
+
+def default_geometry(line_position, height=480):
+    return {'lines': [{'name': 'line', 'points': [[line_position, 0], [line_position, height]]}], 'zones': []}
+
+
+def _points(feature, minimum, kind):
+    points = np.asarray(feature.get('points', []), dtype=np.float64)
+    if points.ndim != 2 or points.shape[1] != 2 or len(points) < minimum:
+        raise ValueError(f"{kind} '{feature.get('name', '')}' needs at least {minimum} [x, y] points")
+    return points
+
+
+class CountingGeometry:
+    def __init__(self, data, version=0):
+        if isinstance(data, str):
+            data = json.loads(data)
+        data = data or {}
+        lines = data.get('lines', [])
+        zones = data.get('zones', [])
+
+        self.data = {'lines': lines, 'zones': zones}
+        # tells a camera process's parent which names its count slots carry
+        self.version = version
+        self.names = [line.get('name') or f'line{i}' for i, line in enumerate(lines)]
+        self.names += [zone.get('name') or f'zone{i}' for i, zone in enumerate(zones)]
+        self.line_count = len(lines)
+
+        starts, ends, signs, line_starts = [], [], [], []
+        self.line_points = []
+        for line in lines:
+            points = _points(line, 2, 'line')
+            line_starts.append(len(starts))
+            starts.extend(points[:-1])
+            ends.extend(points[1:])
+            signs.extend([-1.0 if line.get('invert') else 1.0] * (len(points) - 1))
+            self.line_points.append(points.astype(np.int32))
+        self.segment_start = np.array(starts, dtype=np.float64).reshape(-1, 2)
+        self.segment_end = np.array(ends, dtype=np.float64).reshape(-1, 2)
+        self.segment_sign = np.array(signs, dtype=np.float64)
+        self.line_starts = np.array(line_starts, dtype=np.int64)
+
+        edge_start, edge_end, zone_starts = [], [], []
+        self.zone_points = []
+        for zone in zones:
+            points = _points(zone, 3, 'zone')
+            zone_starts.append(len(edge_start))
+            edge_start.extend(points)
+            edge_end.extend(np.roll(points, -1, axis=0))
+            self.zone_points.append(points.astype(np.int32))
+        self.edge_start = np.array(edge_start, dtype=np.float64).reshape(-1, 2)
+        self.edge_end = np.array(edge_end, dtype=np.float64).reshape(-1, 2)
+        self.zone_starts = np.array(zone_starts, dtype=np.int64)
+
+    def count(self, previous, current):
+        # returns (entries, exits) per feature, lines first then zones
+        features = len(self.names)
+        entries = np.zeros(features, dtype=np.int64)
+        exits = np.zeros(features, dtype=np.int64)
+        if len(current) == 0 or features == 0:
+            return entries, exits
+
+        if self.line_count:
+            line_entries, line_exits = self._cross_lines(previous, current)
+            entries[:self.line_count] = line_entries.sum(axis=0)
+            exits[:self.line_count] = line_exits.sum(axis=0)
+        if len(self.zone_starts):
+            was_inside = self._inside(previous)
+            inside = self._inside(current)
+            entries[self.line_count:] = (inside & ~was_inside).sum(axis=0)
+            exits[self.line_count:] = (~inside & was_inside).sum(axis=0)
+        return entries, exits
+
+    def _cross_lines(self, previous, current):
+        a = self.segment_start[np.newaxis]
+        b = self.segment_end[np.newaxis]
+        p0 = previous[:, np.newaxis]
+        p1 = current[:, np.newaxis]
+        direction = b - a
+        motion = p1 - p0
+
+        # side of the segment before and after, (tracks, segments)
+        before = (direction[..., 0] * (p0[..., 1] - a[..., 1]) - direction[..., 1] * (p0[..., 0] - a[..., 0])) * self.segment_sign
+        after = (direction[..., 0] * (p1[..., 1] - a[..., 1]) - direction[..., 1] * (p1[..., 0] - a[..., 0])) * self.segment_sign
+        # the motion has to pass between the segment's end points
+        to_start = motion[..., 0] * (a[..., 1] - p0[..., 1]) - motion[..., 1] * (a[..., 0] - p0[..., 0])
+        to_end = motion[..., 0] * (b[..., 1] - p0[..., 1]) - motion[..., 1] * (b[..., 0] - p0[..., 0])
+        spans = to_start * to_end <= 0
+
+        entered = spans & (before > 0) & (after <= 0)
+        exited = spans & (before < 0) & (after >= 0)
+        # a step through a polyline vertex touches two segments, count it once
+        entered = np.logical_or.reduceat(entered, self.line_starts, axis=1)
+        exited = np.logical_or.reduceat(exited, self.line_starts, axis=1) & ~entered
+        return entered, exited
+
+    def _inside(self, points):
+        x = points[:, 0:1]
+        y = points[:, 1:2]
+        xi, yi = self.edge_start[:, 0], self.edge_start[:, 1]
+        xj, yj = self.edge_end[:, 0], self.edge_end[:, 1]
+        straddles = (yi > y) != (yj > y)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            crossing_x = (xj - xi) * (y - yi) / (yj - yi) + xi
+        crossings = straddles & (x < crossing_x)
+        return np.add.reduceat(crossings.astype(np.int32), self.zone_starts, axis=1) % 2 == 1
+
+    def regions(self, shape, margin):
+        height, width = shape[:2]
+        boxes = []
+        for points in self.line_points + self.zone_points:
+            x0, y0 = points.min(axis=0) - margin
+            x1, y1 = points.max(axis=0) + margin
+            boxes.append((max(0, int(x0)), max(0, int(y0)), min(width, int(x1)), min(height, int(y1))))
+        return merge_boxes(boxes)
+
+    def draw(self, frame):
+        if self.line_points:
+            cv2.polylines(frame, self.line_points, False, (0, 0, 255), 2)
+        if self.zone_points:
+            cv2.polylines(frame, self.zone_points, True, (0, 255, 255), 2)
+        return frame
@@ -0,0 +1,161 @@
+from collections import deque
+import cv2
+
+try:
+    import av
+except ImportError:
+    av = None
+
+
+FRAME_SIZE = (640, 480)
+# codec skip_frame values, from decoding everything to keyframes only
+SKIP_LEVELS = ('DEFAULT', 'NONREF', 'NONKEY')
+RTSP_OPTIONS = {
+    'rtsp_transport': 'tcp',
+    'fflags': 'nobuffer',
+    'flags': 'low_delay',
+    'max_delay': '500000',
+    'timeout': '5000000'
+}
+
+
+class OpenCVSource:
+    name = 'opencv'
+
+    def __init__(self, source, size=FRAME_SIZE, timeout=(10.0, 5.0)):
+        self.size = size
+        open_timeout, read_timeout = timeout
+        self.cap = cv2.VideoCapture(source, cv2.CAP_ANY, [
+            cv2.CAP_PROP_OPEN_TIMEOUT_MSEC, int(open_timeout * 1000),
+            cv2.CAP_PROP_READ_TIMEOUT_MSEC, int(read_timeout * 1000)
+        ])
+        if not self.cap.isOpened():
+            self.cap.release()
+            raise IOError(f"Cannot open {source}")
+        self.fps = self.cap.get(cv2.CAP_PROP_FPS) or 30
+
+    def grab(self):
+        return self.cap.grab()
+
+    def retrieve(self):
+        ret, frame = self.cap.retrieve()
+        if not ret:
+            return False, None
+        return True, cv2.resize(frame, self.size)
+
+    def read(self):
+        if not self.grab():
+            return False, None
+        return self.retrieve()
+
+    def set_skip(self, level):
+        pass
+
+    def interrupt(self):
+        # a blocked grab returns once the read timeout expires
+        pass
+
+    def rewind(self):
+        self.cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+
+    def release(self):
+        self.cap.release()
+
+
+class PyAVSource:
+    name = 'pyav'
+
+    def __init__(self, source, size=FRAME_SIZE, threads=0, timeout=(10.0, 5.0)):
+        self.size = size
+        live = str(source).startswith(('rtsp://', 'rtsps://'))
+        self.container = av.open(source, options=dict(RTSP_OPTIONS) if live else {}, timeout=timeout)
+        self.stream = self.container.streams.video[0]
+        # frame threading holds back one frame per thread, too much latency for live streams
+        self.stream.thread_type = 'SLICE' if live else 'AUTO'
+        self.stream.codec_context.thread_count = threads
+        self.fps = float(self.stream.average_rate or 30)
+        self.packets = self.container.demux(self.stream)
+        self.decoded = deque()
+        self.frame = None
+        self.skip_level = 0
+        self.interrupted = False
+
+    def grab(self):
+        while not self.decoded:
+            if self.interrupted:
+                return False
+            try:
+                packet = next(self.packets)
+            except (StopIteration, av.FFmpegError):
+                return False
+            if packet.size and self.skip_level == 2 and not packet.is_keyframe:
+                # dropped before the decoder ever sees it. A grab only returns
+                # after feeding a keyframe, so the packets that follow it once
+                # skipping stops still have their references
+                continue
+            try:
+                self.decoded.extend(packet.decode())
+            except av.FFmpegError:
+                continue
+        self.frame = self.decoded.popleft()
+        return True
+
+    def retrieve(self):
+        if self.frame is None:
+            return False, None
+        # swscale resizes and converts in one pass
+        width, height = self.size
+        return True, self.frame.to_ndarray(width=width, height=height, format='bgr24')
+
+    def read(self):
+        if not self.grab():
+            return False, None
+        return self.retrieve()
+
+    def set_skip(self, level):
+        level = min(level, len(SKIP_LEVELS) - 1)
+        if level == self.skip_level:
+            return
+        self.skip_level = level
+        self.stream.codec_context.skip_frame = SKIP_LEVELS[level]
+
+    def interrupt(self):
+        # called from another thread, ends a grab that keeps reading packets
+        # without decoding a frame. A blocked read ends at the read timeout
+        self.interrupted = True
+
+    @property
+    def time(self):
+        return self.frame.time if self.frame is not None else None
+
+    @property
+    def duration(self):
+        if self.stream.duration is not None:
+            return float(self.stream.duration * self.stream.time_base)
+        if self.container.duration is not None:
+            return self.container.duration / av.time_base
+        return None
+
+    def seek(self, seconds):
+        # lands on the keyframe before seconds, callers skip up to it by time
+        self.container.seek(int(seconds / self.stream.time_base), stream=self.stream)
+        self.packets = self.container.demux(self.stream)
+        self.decoded.clear()
+        self.frame = None
+
+    def rewind(self):
+        self.container.seek(0)
+        self.packets = self.container.demux(self.stream)
+        self.decoded.clear()
+        self.frame = None
+
+    def release(self):
+        self.container.close()
+
+
+def open_source(source, backend='pyav', size=FRAME_SIZE, threads=0, timeout=(10.0, 5.0)):
+    # timeout is (open, read) in seconds. Local devices are opened by index,
+    # which only OpenCV understands
+    if backend == 'pyav' and av is not None and not isinstance(source, int):
+        return PyAVSource(source, size, threads, timeout)
+    return OpenCVSource(source, size, timeout)
@@ -0,0 +1,230 @@
+import multiprocessing
+import threading
+from functools import partial
+from multiprocessing import shared_memory
+import cv2
+import numpy as np
+from .utils import DETECTOR_BACKENDS, create_detector, empty_detections
+
+
+_worker_options = None
+_worker_detectors = {}
+_worker_segments = {}
+
+
+def _init_worker(options):
+    global _worker_options
+    # each worker owns one core, let the pool provide the parallelism
+    cv2.setNumThreads(1)
+    _worker_options = options
+
+
+def _detector(backend):
+    detector = _worker_detectors.get(backend)
+    if detector is None:
+        try:
+            detector = create_detector(backend, _worker_options)
+        except Exception as e:
+            print(f"Detector backend {backend} unavailable, using hog: {e}")
+            detector = create_detector()
+        _worker_detectors[backend] = detector
+    return detector
+
+
+def _attach(camera_id, name):
+    # one mapping per camera, a new name means the parent replaced the slot
+    shm = _worker_segments.get(camera_id)
+    if shm is None or shm.name != name:
+        if shm is not None:
+            shm.close()
+        shm = shared_memory.SharedMemory(name=name)
+        _worker_segments[camera_id] = shm
+    return shm
+
+
+def _detect_batch(jobs):
+    groups = {}
+    for index, (camera_id, backend, name, shape, params) in enumerate(jobs):
+        shm = _attach(camera_id, name)
+        frame = np.ndarray(shape, dtype=np.uint8, buffer=shm.buf)
+        groups.setdefault(backend, []).append((index, frame, params))
+
+    results = [empty_detections() for _ in jobs]
+    for backend, items in groups.items():
+        detections = _detector(backend).detect_batch(
+            [frame for _, frame, _ in items],
+            [params for _, _, params in items]
+        )
+        for (index, _, _), result in zip(items, detections):
+            results[index] = result
+    return results
+
+
+class _Request:
+    __slots__ = ('camera_id', 'backend', 'shm', 'shape', 'params', 'event', 'result', 'retired')
+
+    def __init__(self, camera_id, backend, shm, shape, params):
+        self.camera_id = camera_id
+        self.backend = backend
+        self.shm = shm
+        self.shape = shape
+        self.params = params
+        self.event = threading.Event()
+        self.result = empty_detections()
+        self.retired = False
+
+
+class DetectionEngine:
+    def __init__(self, workers, timeout=5.0, options=None):
+        self.workers = max(1, int(workers))
+        self.timeout = timeout
+        self.options = options or {}
+        self.pool = None
+        self.slots = {}
+        self.retired = set()
+        self.pending = {}
+        self.in_flight = 0
+        self.condition = threading.Condition()
+        self.dispatcher = None
+        self.running = False
+
+    def start(self):
+        with self.condition:
+            if self.running:
+                return
+            ctx = multiprocessing.get_context('spawn')
+            self.pool = ctx.Pool(self.workers, initializer=_init_worker, initargs=(self.options,))
+            self.running = True
+        self.dispatcher = threading.Thread(target=self._dispatch, daemon=True)
+        self.dispatcher.start()
+
+    def stop(self):
+        with self.condition:
+            self.running = False
+            for request in self.pending.values():
+                request.event.set()
+            self.pending.clear()
+            self.condition.notify_all()
+        if self.pool is not None:
+            self.pool.terminate()
+            self.pool = None
+        for shm in list(self.slots.values()) + list(self.retired):
+            shm.close()
+            shm.unlink()
+        self.slots.clear()
+        self.retired.clear()
+
+    def is_running(self):
+        return self.running
+
+    def release(self, camera_id):
+        shm = self.slots.pop(str(camera_id), None)
+        if shm is not None:
+            shm.close()
+            shm.unlink()
+
+    def _slot(self, camera_id, nbytes):
+        shm = self.slots.get(camera_id)
+        if shm is None or shm.size < nbytes:
+            if shm is not None:
+                shm.close()
+                shm.unlink()
+            shm = shared_memory.SharedMemory(create=True, size=nbytes)
+            self.slots[camera_id] = shm
+        return shm
+
+    def detect(self, camera_id, frame, backend=None, params=None):
+        if not self.running:
+            return empty_detections()
+        camera_id = str(camera_id)
+        frame = np.ascontiguousarray(frame, dtype=np.uint8)
+        shm = self._slot(camera_id, frame.nbytes)
+        np.ndarray(frame.shape, dtype=np.uint8, buffer=shm.buf)[...] = frame
+        # unknown names fall back to hog like get_detector does in-process
+        backend = backend if backend in DETECTOR_BACKENDS else 'hog'
+        request = _Request(camera_id, backend, shm, frame.shape, params)
+
+        with self.condition:
+            stale = self.pending.get(camera_id)
+            if stale is not None:
+                stale.event.set()
+            self.pending[camera_id] = request
+            self.condition.notify_all()
+
+        if not request.event.wait(self.timeout):
+            print(f"Detection timeout camera {camera_id}")
+            self._retire(request)
+            return empty_detections()
+        return request.result
+
+    def _retire(self, request):
+        # a worker may still be reading the slot, the next frame gets a new
+        # one and this one is freed once its batch has come back
+        with self.condition:
+            if self.slots.get(request.camera_id) is request.shm:
+                del self.slots[request.camera_id]
+            if self.pending.get(request.camera_id) is request:
+                del self.pending[request.camera_id]
+            elif not request.event.is_set():
+                request.retired = True
+                self.retired.add(request.shm)
+                return
+        request.shm.close()
+        request.shm.unlink()
+
+    def _dispatch(self):
+        while True:
+            with self.condition:
+                while self.running and (not self.pending or self.in_flight >= self.workers):
+                    self.condition.wait()
+                if not self.running:
+                    return
+                requests = list(self.pending.values())
+                self.pending.clear()
+                # batched backends get one forward pass for all their cameras,
+                # everything else is spread over the remaining idle workers
+                batches = []
+                split = []
+                groups = {}
+                for request in requests:
+                    groups.setdefault(request.backend, []).append(request)
+                for backend, group in groups.items():
+                    if getattr(DETECTOR_BACKENDS.get(backend), 'batched', False):
+                        batches.append(group)
+                    else:
+                        split.extend(group)
+                if split:
+                    parts = max(1, self.workers - self.in_flight - len(batches))
+                    size = -(-len(split) // parts)
+                    batches.extend(split[i:i + size] for i in range(0, len(split), size))
+                self.in_flight += len(batches)
+
+            for batch in batches:
+                self.pool.apply_async(
+                    _detect_batch,
+                    ([(r.camera_id, r.backend, r.shm.name, r.shape, r.params) for r in batch],),
+                    callback=partial(self._deliver, batch),
+                    error_callback=partial(self._fail, batch)
+                )
+
+    def _deliver(self, batch, results):
+        for request, result in zip(batch, results):
+            request.result = result
+            request.event.set()
+        self._finished(batch)
+
+    def _fail(self, batch, error):
+        print(f"Detection worker error: {error}")
+        for request in batch:
+            request.event.set()
+        self._finished(batch)
+
+    def _finished(self, batch):
+        with self.condition:
+            self.in_flight -= 1
+            retired = [request.shm for request in batch if request.retired and request.shm in self.retired]
+            self.retired.difference_update(retired)
+            self.condition.notify_all()
+        for shm in retired:
+            shm.close()
+            shm.unlink()
@@ -0,0 +1,116 @@
+import atexit
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from config import Config
+from .metrics import Counter, Histogram, Collected
+from .models import Detection, db
+from .rollups import apply_rollups
+
+write_seconds = Histogram('db_write_seconds', "Time to insert and commit one batch of detections")
+batch_rows = Histogram('db_write_batch_rows', "Detections per committed batch",
+                       buckets=(1, 5, 10, 25, 50, 100, 250, 500, 1000))
+written = Counter('detections_written_total', "Detections committed to the database")
+dropped = Counter('detections_dropped_total', "Detections discarded because the writer queue was full or the database kept failing")
+
+
+class DetectionWriter:
+    # crossings are queued by the frame threads and inserted in batches by
+    # one background thread with its own app context, so a slow commit delays
+    # the rows instead of the video. The queue is bounded, when the database
+    # falls that far behind the oldest rows are dropped and counted
+    def __init__(self, max_pending=10000, batch_size=200, flush_interval=1.0, retries=3):
+        self.max_pending = max_pending
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.retries = retries
+        self.pending = deque()
+        self.condition = threading.Condition()
+        self.app = None
+        self.thread = None
+        self.running = False
+        self.failures = 0
+        self.last_error = None
+
+    def init_app(self, app):
+        self.app = app
+        with self.condition:
+            if self.thread is None:
+                self.running = True
+                self.thread = threading.Thread(target=self._run, name="detection-writer", daemon=True)
+                self.thread.start()
+                atexit.register(self.stop)
+
+    def put(self, camera_id, is_entry):
+        row = {
+            'camera_id': int(camera_id),
+            'timestamp': datetime.utcnow(),
+            'confidence': None,
+            'entry_people': 1 if is_entry else 0,
+            'exit_people': 0 if is_entry else 1
+        }
+        with self.condition:
+            if len(self.pending) >= self.max_pending:
+                self.pending.popleft()
+                dropped.inc()
+            self.pending.append(row)
+            if len(self.pending) >= self.batch_size:
+                self.condition.notify()
+
+    def _take(self):
+        with self.condition:
+            if self.running and len(self.pending) < self.batch_size:
+                self.condition.wait(self.flush_interval)
+            count = min(len(self.pending), self.batch_size)
+            return [self.pending.popleft() for _ in range(count)]
+
+    def _run(self):
+        while True:
+            batch = self._take()
+            if batch:
+                self._write(batch)
+            elif not self.running:
+                return
+
+    def _write(self, batch):
+        for attempt in range(self.retries):
+            start = time.perf_counter()
+            try:
+                with self.app.app_context():
+                    db.session.execute(db.insert(Detection), batch)
+                    apply_rollups(db.session, batch)
+                    db.session.commit()
+            except Exception as e:
+                self.failures += 1
+                self.last_error = str(e)
+                print(f"Detection writer error ({len(batch)} rows, attempt {attempt + 1}): {e}")
+                time.sleep(min(5.0, 0.5 * 2 ** attempt))
+                continue
+            write_seconds.observe(time.perf_counter() - start)
+            batch_rows.observe(len(batch))
+            written.inc(amount=len(batch))
+            return
+        dropped.inc(amount=len(batch))
+
+    def stop(self, timeout=10.0):
+        # whatever is still queued is written before the thread exits
+        with self.condition:
+            self.running = False
+            self.condition.notify()
+        if self.thread is not None:
+            self.thread.join(timeout)
+
+    def stats(self):
+        return {
+            'queued': len(self.pending),
+            'max_pending': self.max_pending,
+            'failures': self.failures,
+            'last_error': self.last_error
+        }
+
+
+detection_writer = DetectionWriter(Config.DETECTION_WRITER_QUEUE, Config.DETECTION_WRITER_BATCH, Config.DETECTION_WRITER_INTERVAL)
+
+Collected('detection_writer_queued', "Detections waiting to be written", (), 'gauge',
+          lambda: [((), len(detection_writer.pending))])
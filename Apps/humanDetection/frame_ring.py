@@ -0,0 +1,69 @@
+import numpy as np
+from multiprocessing import shared_memory
+
+
+FRAME_SHAPE = (480, 640, 3)
+MAX_FEATURES = 32
+# latest sequence, geometry version, total entries, total exits, then an
+# entry/exit pair per feature of that geometry
+HEADER_FIELDS = 4 + 2 * MAX_FEATURES
+
+
+class FrameRing:
+    # single writer, many readers. A slot's sequence is set to -1 while it is
+    # written, so a reader can tell whether the slot it read was overwritten.
+    def __init__(self, name=None, slots=3, shape=FRAME_SHAPE):
+        self.slots = slots
+        self.shape = tuple(shape)
+        header_bytes = 8 * (HEADER_FIELDS + slots)
+        size = header_bytes + slots * int(np.prod(self.shape))
+        self.owner = name is None
+        self.shm = shared_memory.SharedMemory(name=name, create=self.owner, size=size if self.owner else 0)
+        self.name = self.shm.name
+        self.header = np.ndarray(HEADER_FIELDS + slots, dtype=np.int64, buffer=self.shm.buf)
+        self.sequences = self.header[HEADER_FIELDS:]
+        self.frames = np.ndarray((slots,) + self.shape, dtype=np.uint8, buffer=self.shm.buf, offset=header_bytes)
+        if self.owner:
+            self.header[:] = 0
+
+    def write(self, frame, counts=None, geometry=0):
+        sequence = int(self.header[0]) + 1
+        slot = sequence % self.slots
+        self.sequences[slot] = -1
+        self.frames[slot] = frame
+        self.sequences[slot] = sequence
+        if counts is not None:
+            counts = np.asarray(counts, dtype=np.int64)[:HEADER_FIELDS - 2]
+            # the version reads -1 while the feature slots change meaning
+            if self.header[1] != geometry:
+                self.header[1] = -1
+            self.header[2:2 + len(counts)] = counts
+            self.header[1] = geometry
+        self.header[0] = sequence
+        return sequence
+
+    def latest(self):
+        # returns (sequence, view), the view is only valid while valid(sequence)
+        sequence = int(self.header[0])
+        if sequence == 0:
+            return 0, None
+        return sequence, self.frames[sequence % self.slots]
+
+    def valid(self, sequence):
+        return sequence > 0 and self.sequences[sequence % self.slots] == sequence
+
+    def counts(self):
+        # returns (geometry version, counts), the version is None when the
+        # geometry changed during the read
+        geometry = int(self.header[1])
+        counts = self.header[2:HEADER_FIELDS].copy()
+        if geometry < 0 or self.header[1] != geometry:
+            return None, counts
+        return geometry, counts
+
+    def close(self):
+        # views keep the buffer exported, drop them before closing
+        self.header = self.sequences = self.frames = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
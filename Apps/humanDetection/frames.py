@@ -0,0 +1,52 @@
+import asyncio
+import threading
+import time
+
+
+class VersionedFrame:
+    # published frames are never written again, readers share the image
+    __slots__ = ('image', 'version', 'timestamp')
+
+    def __init__(self, image, version):
+        image.flags.writeable = False
+        self.image = image
+        self.version = version
+        self.timestamp = time.time()
+
+
+def _wake(futures):
+    for future in futures:
+        if not future.done():
+            future.set_result(None)
+
+
+class FrameSignal:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.version = None
+        self.waiters = {}
+
+    def notify(self, version):
+        with self.lock:
+            self.version = version
+            waiters, self.waiters = self.waiters, {}
+        # one hop into each event loop wakes all of its viewers
+        for loop, futures in waiters.items():
+            loop.call_soon_threadsafe(_wake, futures)
+
+    async def wait(self, version, timeout=None):
+        # returns as soon as the published version differs from version
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        with self.lock:
+            if self.version != version:
+                return self.version
+            self.waiters.setdefault(loop, []).append(future)
+        try:
+            await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            with self.lock:
+                futures = self.waiters.get(loop, [])
+                if future in futures:
+                    futures.remove(future)
+        return self.version
@@ -0,0 +1,50 @@
+import numpy as np
+from .centroid_tracker import CentroidTracker
+
+# constant-velocity model, one processed frame per step
+TRANSITION = np.array([
+    [1, 0, 1, 0],
+    [0, 1, 0, 1],
+    [0, 0, 1, 0],
+    [0, 0, 0, 1],
+], dtype=np.float64)
+
+
+class KalmanTracker(CentroidTracker):
+    arrays = CentroidTracker.arrays + ('velocities', 'covariances')
+
+    def __init__(self, max_disappeared=50, max_distance=None, matching='greedy', capacity=64,
+                 process_noise=1.0, measurement_noise=10.0, initial_velocity_variance=100.0):
+        self.velocities = np.empty((capacity, 2), dtype=np.float64)
+        self.covariances = np.empty((capacity, 4, 4), dtype=np.float64)
+        super().__init__(max_disappeared, max_distance, matching, capacity)
+        self.process_noise = np.diag([0.25, 0.25, 1.0, 1.0]) * process_noise
+        self.measurement_noise = np.eye(2) * measurement_noise
+        self.initial_covariance = np.diag([
+            measurement_noise, measurement_noise,
+            initial_velocity_variance, initial_velocity_variance
+        ])
+
+    def register_many(self, centroids):
+        start = self.count
+        super().register_many(centroids)
+        self.velocities[start:self.count] = 0
+        self.covariances[start:self.count] = self.initial_covariance
+
+    def _predict(self):
+        n = self.count
+        self.centroids[:n] += self.velocities[:n]
+        self.covariances[:n] = TRANSITION @ self.covariances[:n] @ TRANSITION.T + self.process_noise
+        return self.centroids[:n]
+
+    def _correct(self, rows, points):
+        if len(rows) == 0:
+            return
+        covariance = self.covariances[rows]
+        innovation_covariance = covariance[:, :2, :2] + self.measurement_noise
+        gain = covariance[:, :, :2] @ np.linalg.inv(innovation_covariance)
+        innovation = points - self.centroids[rows]
+        correction = np.einsum('kij,kj->ki', gain, innovation)
+        self.centroids[rows] += correction[:, :2]
+        self.velocities[rows] += correction[:, 2:]
+        self.covariances[rows] = covariance - gain @ covariance[:, :2, :]
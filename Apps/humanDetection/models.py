@@ -7,12 +7,26 @@ class Camera(db.Model):
     rtsp_url = db.Column(db.String(255), nullable=True)
     is_active = db.Column(db.Boolean, default=False)
     video_file = db.Column(db.String(255), nullable=True)
+    detector_backend = db.Column(db.String(20), nullable=True)
+    counting_geometry = db.Column(db.Text, nullable=True)
+    priority = db.Column(db.Integer, nullable=False, default=0, server_default='0')
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
 class Detection(db.Model):
+    __table_args__ = (
+        db.Index('ix_detection_camera_id_timestamp', 'camera_id', 'timestamp'),
+        db.Index('ix_detection_timestamp', 'timestamp'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     camera_id = db.Column(db.Integer, db.ForeignKey('camera.id'), nullable=False)
     timestamp = db.Column(db.DateTime, default=datetime.utcnow)
     confidence = db.Column(db.Float)
     entry_people = db.Column(db.Integer, nullable=False)
-    exit_people = db.Column(db.Integer, nullable=False)
\ No newline at end of file
+    exit_people = db.Column(db.Integer, nullable=False)
+
+class DetectionRollup(db.Model):
+    camera_id = db.Column(db.Integer, db.ForeignKey('camera.id'), primary_key=True)
+    resolution = db.Column(db.String(10), primary_key=True)
+    bucket = db.Column(db.DateTime, primary_key=True)
+    entries = db.Column(db.Integer, nullable=False, default=0)
+    exits = db.Column(db.Integer, nullable=False, default=0)
@@ -0,0 +1,81 @@
+import cv2
+
+
+class MotionGate:
+    def __init__(self, scale=0.25, min_area=600, padding=24, min_size=(96, 160), full_frame_ratio=0.5):
+        self.scale = scale
+        self.min_area = min_area
+        self.padding = padding
+        self.min_size = min_size
+        self.full_frame_ratio = full_frame_ratio
+        self.subtractor = cv2.createBackgroundSubtractorMOG2(history=300, varThreshold=25, detectShadows=False)
+        self.kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (3, 3))
+        self.frames = 0
+        self.skipped = 0
+
+    def regions(self, frame):
+        small = cv2.resize(frame, None, fx=self.scale, fy=self.scale, interpolation=cv2.INTER_AREA)
+        gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        mask = self.subtractor.apply(gray)
+        mask = cv2.morphologyEx(mask, cv2.MORPH_OPEN, self.kernel)
+        mask = cv2.dilate(mask, self.kernel, iterations=2)
+        contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+
+        min_area = self.min_area * self.scale * self.scale
+        boxes = []
+        for contour in contours:
+            if cv2.contourArea(contour) < min_area:
+                continue
+            x, y, w, h = cv2.boundingRect(contour)
+            boxes.append(self._expand(frame.shape, x / self.scale, y / self.scale, w / self.scale, h / self.scale))
+
+        self.frames += 1
+        if not boxes:
+            self.skipped += 1
+            return []
+
+        boxes = merge_boxes(boxes)
+        height, width = frame.shape[:2]
+        area = sum((x1 - x0) * (y1 - y0) for x0, y0, x1, y1 in boxes)
+        if area >= self.full_frame_ratio * width * height:
+            return [(0, 0, width, height)]
+        return boxes
+
+    def _expand(self, shape, x, y, w, h):
+        height, width = shape[:2]
+        min_w, min_h = self.min_size
+        cx, cy = x + w / 2, y + h / 2
+        w = min(width, max(w + 2 * self.padding, min_w))
+        h = min(height, max(h + 2 * self.padding, min_h))
+        x0 = int(max(0, min(cx - w / 2, width - w)))
+        y0 = int(max(0, min(cy - h / 2, height - h)))
+        return (x0, y0, int(min(width, x0 + w)), int(min(height, y0 + h)))
+
+    def stats(self):
+        return {
+            'frames': self.frames,
+            'skipped': self.skipped,
+            'skip_ratio': self.skipped / self.frames if self.frames else 0.0
+        }
+
+
+def merge_boxes(boxes):
+    boxes = list(boxes)
+    merged = True
+    while merged:
+        merged = False
+        result = []
+        while boxes:
+            x0, y0, x1, y1 = boxes.pop()
+            i = 0
+            while i < len(boxes):
+                bx0, by0, bx1, by1 = boxes[i]
+                if bx0 <= x1 and x0 <= bx1 and by0 <= y1 and y0 <= by1:
+                    x0, y0, x1, y1 = min(x0, bx0), min(y0, by0), max(x1, bx1), max(y1, by1)
+                    boxes.pop(i)
+                    merged = True
+                else:
+                    i += 1
+            result.append((x0, y0, x1, y1))
+        boxes = result
+    return boxes
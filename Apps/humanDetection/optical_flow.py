@@ -0,0 +1,39 @@
+import cv2
+import numpy as np
+
+
+class FlowTracker:
+    def __init__(self, interval=5, crowd_step=4, win_size=(21, 21), max_level=2):
+        self.interval = interval
+        self.crowd_step = crowd_step
+        self.lk_params = dict(
+            winSize=win_size,
+            maxLevel=max_level,
+            criteria=(cv2.TERM_CRITERIA_EPS | cv2.TERM_CRITERIA_COUNT, 10, 0.03)
+        )
+        self.prev_gray = None
+        self.skipped = 0
+
+    def current_interval(self, tracked):
+        # crowded scenes get more occlusions and new arrivals, detect more often
+        return max(1, self.interval - tracked // self.crowd_step)
+
+    def due(self, tracked):
+        if self.prev_gray is None or self.skipped >= self.current_interval(tracked) - 1:
+            self.skipped = 0
+            return True
+        self.skipped += 1
+        return False
+
+    def reset(self, gray):
+        self.prev_gray = gray
+
+    def propagate(self, gray, points):
+        if len(points) and self.prev_gray is not None and self.prev_gray.shape == gray.shape:
+            start = np.asarray(points, dtype=np.float32).reshape(-1, 1, 2)
+            moved, status, _ = cv2.calcOpticalFlowPyrLK(self.prev_gray, gray, start, None, **self.lk_params)
+            height, width = gray.shape[:2]
+            moved = np.clip(moved.reshape(-1, 2), 0, (width - 1, height - 1))
+            points = np.where(status.reshape(-1, 1) == 1, moved, points)
+        self.prev_gray = gray
+        return points
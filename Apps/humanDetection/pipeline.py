@@ -0,0 +1,129 @@
+import threading
+from collections import deque
+
+
+DROP_OLDEST = 'drop_oldest'
+DROP_NEWEST = 'drop_newest'
+
+
+class LatestQueue:
+    def __init__(self, maxsize=1, policy=DROP_OLDEST):
+        if policy not in (DROP_OLDEST, DROP_NEWEST):
+            raise ValueError(f"Unknown drop policy '{policy}'")
+        self.maxsize = max(1, maxsize)
+        self.policy = policy
+        self.items = deque()
+        self.condition = threading.Condition()
+        self.closed = False
+        self.put_count = 0
+        self.dropped = 0
+
+    def put(self, item):
+        with self.condition:
+            if self.closed:
+                return False
+            self.put_count += 1
+            if len(self.items) >= self.maxsize:
+                self.dropped += 1
+                if self.policy == DROP_NEWEST:
+                    return False
+                self.items.popleft()
+            self.items.append(item)
+            self.condition.notify()
+            return True
+
+    def get(self, timeout=None):
+        with self.condition:
+            if not self.items and not self.closed:
+                self.condition.wait(timeout)
+            if self.items:
+                return self.items.popleft()
+            return None
+
+    def close(self):
+        with self.condition:
+            self.closed = True
+            self.items.clear()
+            self.condition.notify_all()
+
+    def __len__(self):
+        return len(self.items)
+
+
+class Stage:
+    def __init__(self, name, func, inbox, outbox=None):
+        self.name = name
+        self.func = func
+        self.inbox = inbox
+        self.outbox = outbox
+        self.processed = 0
+        self.errors = 0
+        self.running = False
+        self.thread = None
+
+    def start(self, label):
+        self.running = True
+        self.thread = threading.Thread(target=self._run, name=f"{label}-{self.name}", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+
+    def _run(self):
+        while self.running:
+            item = self.inbox.get(timeout=0.5)
+            if item is None:
+                continue
+            try:
+                result = self.func(item)
+            except Exception as e:
+                self.errors += 1
+                print(f"Pipeline stage {self.name} error: {e}")
+                continue
+            self.processed += 1
+            if self.outbox is not None and result is not None:
+                self.outbox.put(result)
+
+    def stats(self):
+        return {
+            'processed': self.processed,
+            'errors': self.errors,
+            'queued': len(self.inbox),
+            'dropped': self.inbox.dropped
+        }
+
+
+class Pipeline:
+    def __init__(self, label, stages, queue_size=1, policy=DROP_OLDEST):
+        self.label = label
+        self.stages = []
+        inbox = LatestQueue(queue_size, policy)
+        self.inbox = inbox
+        for index, (name, func) in enumerate(stages):
+            last = index == len(stages) - 1
+            outbox = None if last else LatestQueue(queue_size, policy)
+            self.stages.append(Stage(name, func, inbox, outbox))
+            inbox = outbox
+
+    def start(self):
+        for stage in self.stages:
+            stage.start(self.label)
+
+    def submit(self, item):
+        return self.inbox.put(item)
+
+    def saturated(self):
+        return any(len(stage.inbox) >= stage.inbox.maxsize for stage in self.stages)
+
+    def stop(self):
+        for stage in self.stages:
+            stage.stop()
+            stage.inbox.close()
+        for stage in self.stages:
+            if stage.thread is not None and stage.thread is not threading.current_thread():
+                stage.thread.join(timeout=2.0)
+
+    def stats(self):
+        stats = {'decode': {'processed': self.inbox.put_count}}
+        stats.update((stage.name, stage.stats()) for stage in self.stages)
+        return stats
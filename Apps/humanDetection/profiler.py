@@ -0,0 +1,227 @@
+import cProfile
+import marshal
+import os
+import pstats
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from .registry import prune_finished
+
+MAX_SESSIONS = 20
+
+profile_sessions = {}
+_active = {}
+_lock = threading.Lock()
+
+
+def active(camera_id):
+    # called for every stage of every frame, only a dict check while idle
+    if not _active:
+        return None
+    session = _active.get(camera_id) or _active.get(None)
+    return session if session is not None and session.mode == 'cprofile' else None
+
+
+def _key(code):
+    return code.co_filename, code.co_firstlineno, code.co_name
+
+
+def _cpu_time(native_id):
+    # nanoseconds the thread has run on a CPU, None where /proc is missing
+    try:
+        with open(f"/proc/self/task/{native_id}/schedstat") as f:
+            return int(f.read().split()[0])
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def _label(code):
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class ProfileSession:
+    # profiles one camera, or the whole process when camera_id is None, for a
+    # fixed time. Sampling reads every thread's stack at an interval, cprofile
+    # additionally traces the frame stages deterministically
+    def __init__(self, camera_id, mode, seconds, directory, threads=None, interval=0.005, top=25):
+        self.id = uuid.uuid4().hex[:12]
+        self.camera_id = camera_id
+        self.mode = mode
+        self.seconds = seconds
+        self.directory = directory
+        self.threads = threads
+        self.interval = interval
+        self.top = top
+        self.state = 'running'
+        self.error = None
+        self.started = None
+        self.finished = None
+        self.samples = 0
+        self.stacks = Counter()
+        self.hits = Counter()
+        self.profiles = {}
+        self.calls_in_flight = 0
+        self.lock = threading.Lock()
+        self.files = {}
+        self.summary = None
+
+    def run(self, func, *args):
+        ident = threading.get_ident()
+        with self.lock:
+            profile = self.profiles.get(ident)
+            if profile is None:
+                # a cProfile.Profile only traces the thread that enabled it
+                profile = self.profiles[ident] = cProfile.Profile()
+            self.calls_in_flight += 1
+        try:
+            return profile.runcall(func, *args)
+        finally:
+            with self.lock:
+                self.calls_in_flight -= 1
+
+    def start(self):
+        if self.camera_id in _active:
+            raise ValueError("A profile is already running for this target")
+        self.started = time.time()
+        _active[self.camera_id] = self
+        threading.Thread(target=self._sample, name=f"profile-{self.id}", daemon=True).start()
+
+    def _sample(self):
+        own = threading.get_ident()
+        threads = {}
+        cpu = {}
+        end = time.monotonic() + self.seconds
+        try:
+            while time.monotonic() < end:
+                idents = self.threads() if self.threads is not None else None
+                for ident, frame in sys._current_frames().items():
+                    if ident == own or (idents is not None and ident not in idents):
+                        continue
+                    if ident not in threads:
+                        threads = {thread.ident: thread for thread in threading.enumerate()}
+                    thread = threads.get(ident)
+                    # each stack is weighted by the CPU microseconds its thread
+                    # used since the last sample, a thread blocked in sleep, a
+                    # lock or a read adds nothing
+                    used = _cpu_time(thread.native_id) if thread is not None else None
+                    if used is None:
+                        weight = int(self.interval * 1e6)
+                    else:
+                        previous = cpu.get(ident)
+                        cpu[ident] = used
+                        weight = (used - previous) // 1000 if previous is not None else 0
+                    if weight <= 0:
+                        continue
+                    stack = []
+                    while frame is not None:
+                        stack.append(frame.f_code)
+                        frame = frame.f_back
+                    stack.reverse()
+                    key = (thread.name if thread is not None else str(ident), tuple(stack))
+                    self.stacks[key] += weight
+                    self.hits[key] += 1
+                self.samples += 1
+                time.sleep(self.interval)
+            self._finish()
+        except Exception as e:
+            print(f"Profile {self.id} failed: {e}")
+            self.state = 'failed'
+            self.error = str(e)
+        finally:
+            if _active.get(self.camera_id) is self:
+                del _active[self.camera_id]
+            self.finished = time.time()
+
+    def _finish(self):
+        if _active.get(self.camera_id) is self:
+            del _active[self.camera_id]
+        # stages already inside a traced call finish it before the stats are read
+        while self.calls_in_flight:
+            time.sleep(0.01)
+
+        os.makedirs(self.directory, exist_ok=True)
+        target = f"camera-{self.camera_id}" if self.camera_id is not None else 'process'
+        base = os.path.join(self.directory, f"{time.strftime('%Y%m%d-%H%M%S')}-{target}-{self.mode}-{self.id}")
+
+        self.files['collapsed'] = base + '.collapsed'
+        with open(self.files['collapsed'], 'w') as f:
+            for (thread, stack), count in self.stacks.most_common():
+                f.write(';'.join([thread] + [_label(code) for code in stack]) + f" {count}\n")
+
+        self.files['pstats'] = base + '.pstats'
+        if self.mode == 'cprofile' and self.profiles:
+            stats = pstats.Stats(*self.profiles.values())
+            stats.dump_stats(self.files['pstats'])
+        else:
+            sampled = self._sampled_stats()
+            with open(self.files['pstats'], 'wb') as f:
+                marshal.dump(sampled, f)
+            # pstats refuses an empty profile, e.g. targets that stayed idle
+            stats = pstats.Stats(self.files['pstats']) if sampled else None
+        self.summary = self._top(stats) if stats is not None else []
+        self.state = 'done'
+
+    def _sampled_stats(self):
+        # the pstats layout, {function: (calls, primitive calls, own time,
+        # cumulative time, {caller: (...)})}, filled in from the samples so
+        # the same tools open both modes. Calls are the samples the function
+        # was seen in, times the CPU time those samples stand for
+        own = Counter()
+        cumulative = Counter()
+        hits = Counter()
+        callers = {}
+        for key, micros in self.stacks.items():
+            stack = key[1]
+            own[_key(stack[-1])] += micros
+            for function in {_key(code) for code in stack}:
+                cumulative[function] += micros
+                hits[function] += self.hits[key]
+            for caller, callee in zip(stack, stack[1:]):
+                edges = callers.setdefault(_key(callee), {})
+                n, micros_before = edges.get(_key(caller), (0, 0))
+                edges[_key(caller)] = (n + self.hits[key], micros_before + micros)
+        stats = {}
+        for function, micros in cumulative.items():
+            edges = {caller: (n, n, t / 1e6, t / 1e6) for caller, (n, t) in callers.get(function, {}).items()}
+            stats[function] = (hits[function], hits[function], own[function] / 1e6, micros / 1e6, edges)
+        return stats
+
+    def _top(self, stats):
+        rows = []
+        for (filename, line, name), (_, calls, own, cumulative, _) in stats.stats.items():
+            rows.append({
+                'function': f"{name} ({filename}:{line})",
+                'calls': calls,
+                'own_seconds': round(own, 4),
+                'cumulative_seconds': round(cumulative, 4)
+            })
+        rows.sort(key=lambda row: row['own_seconds'], reverse=True)
+        return rows[:self.top]
+
+    def stats(self):
+        return {
+            'id': self.id,
+            'camera_id': self.camera_id,
+            'mode': self.mode,
+            'seconds': self.seconds,
+            'state': self.state,
+            'error': self.error,
+            'samples': self.samples,
+            'files': self.files,
+            'top': self.summary
+        }
+
+
+def start_profile(camera_id, mode, seconds, directory, threads=None):
+    if mode == 'cprofile' and sys.version_info >= (3, 12):
+        # from 3.12 cProfile runs on the process-wide sys.monitoring, only one
+        # Profile can be enabled at a time, not one per stage thread
+        mode = 'sample'
+    with _lock:
+        session = ProfileSession(camera_id, mode, seconds, directory, threads)
+        session.start()
+        profile_sessions[session.id] = session
+        prune_finished(profile_sessions, MAX_SESSIONS)
+    return session
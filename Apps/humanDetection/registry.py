@@ -0,0 +1,7 @@
+def prune_finished(registry, limit):
+    # registry maps ids to jobs that set .finished when done. Finished ones
+    # stay readable by id until there are more than limit entries, then the
+    # oldest go; running ones are never dropped
+    finished = [key for key, entry in registry.items() if entry.finished is not None]
+    for key in finished[:max(0, len(registry) - limit)]:
+        del registry[key]
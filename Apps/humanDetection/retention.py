@@ -0,0 +1,146 @@
+import csv
+import gzip
+import os
+import threading
+from collections import defaultdict
+from datetime import datetime, timedelta
+from config import Config
+from .metrics import Counter
+from .models import Detection, DetectionRollup, db
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+archived = Counter('detections_archived_total', "Detections moved from the database to archive files")
+pruned = Counter('rollups_pruned_total', "Minute rollups deleted once they left the retention window")
+
+COLUMNS = ('id', 'camera_id', 'timestamp', 'confidence', 'entry_people', 'exit_people')
+
+
+def archive_path(directory, camera_id, day):
+    return os.path.join(directory, f"camera_{camera_id}", f"{day.isoformat()}.csv.gz")
+
+
+def _write_partition(path, rows):
+    # appending adds a gzip member, readers treat the file as one stream
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    new = not os.path.exists(path)
+    with gzip.open(path, 'at', newline='') as f:
+        writer = csv.writer(f)
+        if new:
+            writer.writerow(COLUMNS)
+        writer.writerows(rows)
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def retention_cutoff(days):
+    return (datetime.utcnow() - timedelta(days=days)).replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def archive_detections(app, days, directory, batch_size=5000):
+    # moves detections from before the start of the day `days` ago into
+    # directory/camera_<id>/<day>.csv.gz, oldest first, one batch per
+    # transaction. Rows are deleted only after their file is synced, a crash in
+    # between can leave a row in both places but never in neither, the id
+    # column tells them apart. Reports keep working from the rollups
+    cutoff = retention_cutoff(days)
+    total = 0
+    with app.app_context():
+        while True:
+            rows = Detection.query.with_entities(
+                Detection.id, Detection.camera_id, Detection.timestamp, Detection.confidence,
+                Detection.entry_people, Detection.exit_people
+            ).filter(
+                Detection.timestamp < cutoff
+            ).order_by(Detection.timestamp, Detection.id).limit(batch_size).all()
+            if not rows:
+                break
+
+            partitions = defaultdict(list)
+            for row in rows:
+                partitions[(row.camera_id, row.timestamp.date())].append(
+                    (row.id, row.camera_id, row.timestamp.isoformat(), row.confidence, row.entry_people, row.exit_people)
+                )
+            for (camera_id, day), partition in partitions.items():
+                _write_partition(archive_path(directory, camera_id, day), partition)
+
+            Detection.query.filter(Detection.id.in_([row.id for row in rows])).delete(synchronize_session=False)
+            db.session.commit()
+            archived.inc(amount=len(rows))
+            total += len(rows)
+    return total
+
+
+def prune_rollups(app, days):
+    # minute buckets are only read for short spans, past the retention window
+    # the hour and day rollups keep the same totals
+    cutoff = retention_cutoff(days)
+    with app.app_context():
+        count = DetectionRollup.query.filter(
+            DetectionRollup.resolution == 'minute',
+            DetectionRollup.bucket < cutoff
+        ).delete(synchronize_session=False)
+        db.session.commit()
+    pruned.inc(amount=count)
+    return count
+
+
+class RetentionJob:
+    # archives and prunes minute rollups on an interval. A lock file in the
+    # archive directory keeps the web server and a headless supervisor from
+    # archiving the same rows
+    def __init__(self, app, days, directory, interval=3600.0, batch_size=5000):
+        self.app = app
+        self.days = days
+        self.directory = directory
+        self.interval = interval
+        self.batch_size = batch_size
+        self.stop_event = threading.Event()
+        self.thread = None
+        self.last_run = None
+        self.last_archived = 0
+        self.last_error = None
+
+    def run_once(self):
+        os.makedirs(self.directory, exist_ok=True)
+        with open(os.path.join(self.directory, '.lock'), 'w') as lock:
+            if fcntl is not None:
+                try:
+                    fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except OSError:
+                    return 0
+            self.last_archived = archive_detections(self.app, self.days, self.directory, self.batch_size)
+            prune_rollups(self.app, self.days)
+        self.last_run = datetime.utcnow()
+        if self.last_archived:
+            print(f"Archived {self.last_archived} detections older than {self.days} days")
+        return self.last_archived
+
+    def run(self):
+        while not self.stop_event.is_set():
+            try:
+                self.run_once()
+                self.last_error = None
+            except Exception as e:
+                self.last_error = str(e)
+                print(f"Detection retention error: {e}")
+            self.stop_event.wait(self.interval)
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run, name="detection-retention", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+
+
+def start_retention(app):
+    if Config.DETECTION_RETENTION_DAYS <= 0:
+        return None
+    job = RetentionJob(app, Config.DETECTION_RETENTION_DAYS, Config.ARCHIVE_DIR,
+                       Config.RETENTION_INTERVAL, Config.RETENTION_BATCH)
+    job.start()
+    return job
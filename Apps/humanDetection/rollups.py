@@ -0,0 +1,117 @@
+import math
+from collections import defaultdict
+from datetime import datetime, timedelta
+from sqlalchemy.dialects import postgresql, sqlite
+from .models import DetectionRollup
+
+# every crossing is added to one bucket per resolution when it is written, a
+# report then reads at most a few hundred rollup rows however long the
+# history is
+RESOLUTIONS = {
+    'minute': timedelta(minutes=1),
+    'hour': timedelta(hours=1),
+    'day': timedelta(days=1)
+}
+
+
+def bucket_start(timestamp, resolution):
+    if resolution == 'minute':
+        return timestamp.replace(second=0, microsecond=0)
+    if resolution == 'hour':
+        return timestamp.replace(minute=0, second=0, microsecond=0)
+    return timestamp.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def aggregate(rows):
+    # rows are detection dicts, returns rollup increments
+    totals = defaultdict(lambda: [0, 0])
+    for row in rows:
+        timestamp = row.get('timestamp') or datetime.utcnow()
+        for resolution in RESOLUTIONS:
+            total = totals[(row['camera_id'], resolution, bucket_start(timestamp, resolution))]
+            total[0] += row['entry_people']
+            total[1] += row['exit_people']
+    return [{'camera_id': camera_id, 'resolution': resolution, 'bucket': bucket, 'entries': entries, 'exits': exits}
+            for (camera_id, resolution, bucket), (entries, exits) in totals.items()]
+
+
+def apply_rollups(session, rows):
+    # runs in the transaction that inserts the detections, so the rollups
+    # never disagree with the rows they were built from
+    increments = aggregate(rows)
+    if not increments:
+        return
+    dialect = session.get_bind().dialect.name
+    if dialect in ('sqlite', 'postgresql'):
+        insert = sqlite.insert if dialect == 'sqlite' else postgresql.insert
+        statement = insert(DetectionRollup)
+        statement = statement.on_conflict_do_update(
+            index_elements=['camera_id', 'resolution', 'bucket'],
+            set_={
+                'entries': DetectionRollup.entries + statement.excluded.entries,
+                'exits': DetectionRollup.exits + statement.excluded.exits
+            }
+        )
+        session.execute(statement, increments)
+        return
+    for increment in increments:
+        key = (increment['camera_id'], increment['resolution'], increment['bucket'])
+        rollup = session.get(DetectionRollup, key)
+        if rollup is None:
+            session.add(DetectionRollup(**increment))
+        else:
+            rollup.entries += increment['entries']
+            rollup.exits += increment['exits']
+
+
+def choose_resolution(start, end, max_points, pruned_before=None):
+    # the finest resolution that still fits, coarser ones read fewer rows.
+    # Minute buckets before pruned_before were deleted by retention
+    span = end - start
+    for name, size in RESOLUTIONS.items():
+        if name == 'minute' and pruned_before is not None and bucket_start(start, name) < pruned_before:
+            continue
+        if span / size <= max_points:
+            return name
+    return 'day'
+
+
+def count_series(camera_id, start, end, resolution=None, step=None, max_points=500, pruned_before=None):
+    # entry/exit totals from start to end in buckets of step x resolution,
+    # empty buckets included. start is rounded down to its bucket
+    resolution = resolution or choose_resolution(start, end, max_points, pruned_before)
+    size = RESOLUTIONS[resolution]
+    origin = bucket_start(start, resolution)
+    if resolution == 'minute' and pruned_before is not None and origin < pruned_before:
+        raise ValueError(f"minute buckets before {pruned_before.isoformat()} were pruned; use hour or day")
+    buckets = max(1, math.ceil((end - origin) / size))
+    step = step or max(1, math.ceil(buckets / max_points))
+    points = math.ceil(buckets / step)
+    if points > max_points:
+        raise ValueError(f"{points} points requested, at most {max_points} are served; use a coarser resolution or step")
+
+    series = [[0, 0] for _ in range(points)]
+    rows = DetectionRollup.query.with_entities(
+        DetectionRollup.bucket, DetectionRollup.entries, DetectionRollup.exits
+    ).filter(
+        DetectionRollup.camera_id == camera_id,
+        DetectionRollup.resolution == resolution,
+        DetectionRollup.bucket >= origin,
+        DetectionRollup.bucket < end
+    )
+    for bucket, entries, exits in rows:
+        index = int((bucket - origin) / size) // step
+        series[index][0] += entries
+        series[index][1] += exits
+
+    return {
+        'camera_id': camera_id,
+        'resolution': resolution,
+        'step': step,
+        'start': origin.isoformat(),
+        'end': end.isoformat(),
+        'entries': sum(point[0] for point in series),
+        'exits': sum(point[1] for point in series),
+        'series': [{'bucket': (origin + size * step * index).isoformat(), 'entries': entries, 'exits': exits}
+                   for index, (entries, exits) in enumerate(series)]
+    }
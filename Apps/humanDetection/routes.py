@@ -1,9 +1,20 @@
 from asyncio.log import logger
-from flask import Blueprint, request, jsonify, render_template
-from flask_login import login_required
+from flask import Blueprint, request, jsonify, render_template, current_app
+from flask_login import login_required, current_user
 from flask import Blueprint
 from app import csrf
-from .models import Camera, Detection
+from .models import Camera, Detection, DetectionRollup
+from .utils import DETECTOR_BACKENDS
+from .counting import CountingGeometry
+from .webrtc_service import set_counting_geometry, frame_manager
+from .video_analysis import analysis_jobs, start_analysis
+from .profiler import profile_sessions, start_profile
+from .rollups import RESOLUTIONS, count_series
+from .retention import retention_cutoff
+from config import Config
+from functools import wraps
+from datetime import datetime, timedelta, timezone
+import json
 from app import  db
 import os
 import time
@@ -13,6 +24,15 @@ active_cameras = {}
 detection = Blueprint('detection', __name__)
 
 
+def admin_required(view):
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if not current_user.is_admin:
+            return jsonify({"error": "Admin access required"}), 403
+        return view(*args, **kwargs)
+    return wrapper
+
+
 @detection.route("/dashboard")
 @login_required
 def dashboard():
@@ -75,17 +95,43 @@ def update_camera(camera_id):
         data = request.get_json() if request.is_json else request.form
         name = data.get("name")
         rtsp_url = data.get("rtsp_url")
+        # omitted keys keep their stored values, an empty value clears them
+        detector_backend = data.get("detector_backend") or None
         if not name or not rtsp_url:
             return jsonify({"error": "Name and RTSP URL are required"}), 400
+        if detector_backend and detector_backend not in DETECTOR_BACKENDS:
+            return jsonify({"error": f"Unknown detector backend '{detector_backend}'"}), 400
+        counting_geometry = data.get("counting_geometry") or None
+        if "counting_geometry" not in data:
+            counting_geometry = camera.counting_geometry
+        elif counting_geometry is not None:
+            try:
+                if isinstance(counting_geometry, str):
+                    counting_geometry = json.loads(counting_geometry)
+                CountingGeometry(counting_geometry)
+            except (ValueError, TypeError, AttributeError) as e:
+                return jsonify({"error": f"Invalid counting geometry: {str(e)}"}), 400
+            counting_geometry = json.dumps(counting_geometry)
+        try:
+            priority = int(data.get("priority") or 0) if "priority" in data else camera.priority
+        except (ValueError, TypeError):
+            return jsonify({"error": "Priority must be an integer"}), 400
         try:
             camera.name = name
             camera.rtsp_url = rtsp_url
+            if "detector_backend" in data:
+                camera.detector_backend = detector_backend
+            camera.counting_geometry = counting_geometry
+            camera.priority = max(0, priority)
+            if "is_active" in data:
+                camera.is_active = str(data.get("is_active")).lower() in ("1", "true", "on")
             db.session.commit()
+            set_counting_geometry(camera.id, counting_geometry)
             return jsonify({"message": "Camera updated successfully"}), 200
         except Exception as e:
             db.session.rollback()
             return jsonify({"error": f"Failed to update camera: {str(e)}"}), 500
-    return render_template("detection/update_camera.html", camera=camera)
+    return render_template("detection/update_camera.html", camera=camera, backends=list(DETECTOR_BACKENDS))
 
 
 
@@ -98,6 +144,7 @@ def delete_camera(camera_id):
         if camera_id in active_cameras:
             active_cameras[camera_id]["active"] = False
         Detection.query.filter_by(camera_id=camera_id).delete()
+        DetectionRollup.query.filter_by(camera_id=camera_id).delete()
         db.session.delete(camera)
         db.session.commit()
         return jsonify({"message": "Camera deleted successfully"}), 200
@@ -115,8 +162,111 @@ def get_camera(camera_id):
         "id": camera.id,
         "name": camera.name,
         "rtsp_url": camera.rtsp_url,
-        "is_active": camera.is_active
+        "is_active": camera.is_active,
+        "detector_backend": camera.detector_backend,
+        "counting_geometry": json.loads(camera.counting_geometry) if camera.counting_geometry else None,
+        "priority": camera.priority
     })
 
 
 
+
+
+def parse_utc(value):
+    # detection timestamps are naive UTC, offsets in the query are converted
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+@detection.route("/camera/<int:camera_id>/counts", methods=["GET"])
+@login_required
+def get_camera_counts(camera_id):
+    Camera.query.get_or_404(camera_id)
+    resolution = request.args.get("resolution") or None
+    if resolution is not None and resolution not in RESOLUTIONS:
+        return jsonify({"error": f"Resolution must be one of {', '.join(RESOLUTIONS)}"}), 400
+    try:
+        end = parse_utc(request.args["end"]) if request.args.get("end") else datetime.utcnow()
+        start = parse_utc(request.args["start"]) if request.args.get("start") else end - timedelta(days=1)
+        step = int(request.args["step"]) if request.args.get("step") else None
+        if start >= end or (step is not None and step < 1):
+            raise ValueError("start must be before end and step at least 1")
+        pruned_before = retention_cutoff(Config.DETECTION_RETENTION_DAYS) if Config.DETECTION_RETENTION_DAYS > 0 else None
+        return jsonify(count_series(camera_id, start, end, resolution, step, Config.ROLLUP_MAX_POINTS, pruned_before))
+    except (ValueError, TypeError) as e:
+        return jsonify({"error": f"Invalid count query: {str(e)}"}), 400
+
+
+@detection.route("/camera/<int:camera_id>/analysis", methods=["POST"])
+@login_required
+def start_video_analysis(camera_id):
+    camera = Camera.query.get_or_404(camera_id)
+    if not camera.video_file or not os.path.exists(camera.video_file):
+        return jsonify({"error": "Camera has no uploaded video file"}), 400
+    data = request.get_json(silent=True) or {}
+    try:
+        start_time = datetime.fromisoformat(data["start_time"]) if data.get("start_time") else None
+        workers = int(data["workers"]) if data.get("workers") else None
+        segment_seconds = float(data["segment_seconds"]) if data.get("segment_seconds") else None
+    except (ValueError, TypeError) as e:
+        return jsonify({"error": f"Invalid analysis options: {str(e)}"}), 400
+    job = start_analysis(current_app._get_current_object(), camera, start_time, workers, segment_seconds)
+    return jsonify(job.stats()), 202
+
+
+@detection.route("/camera/<int:camera_id>/analysis", methods=["GET"])
+@login_required
+def list_video_analysis(camera_id):
+    jobs = [job.stats() for job in analysis_jobs.values() if job.camera_id == str(camera_id)]
+    return jsonify(jobs)
+
+
+@detection.route("/analysis/<job_id>", methods=["GET"])
+@login_required
+def get_video_analysis(job_id):
+    job = analysis_jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": "Analysis job not found"}), 404
+    return jsonify(job.stats())
+
+
+@detection.route("/profile", methods=["POST"])
+@login_required
+@admin_required
+def start_profiling():
+    data = request.get_json(silent=True) or {}
+    mode = data.get("mode", "sample")
+    if mode not in ("sample", "cprofile"):
+        return jsonify({"error": "Mode must be 'sample' or 'cprofile'"}), 400
+    try:
+        seconds = float(data.get("seconds", 10))
+    except (ValueError, TypeError) as e:
+        return jsonify({"error": f"Invalid profile duration: {str(e)}"}), 400
+    if not 0 < seconds <= Config.PROFILE_MAX_SECONDS:
+        return jsonify({"error": f"Duration must be between 0 and {Config.PROFILE_MAX_SECONDS} seconds"}), 400
+
+    # without a camera the whole process is sampled, cprofile then traces
+    # the frame stages of every camera
+    camera_id = str(data["camera_id"]) if data.get("camera_id") is not None else None
+    threads = None
+    if camera_id is not None:
+        if not frame_manager.is_running(camera_id):
+            return jsonify({"error": f"Camera {camera_id} is not running"}), 400
+        threads = lambda: frame_manager.threads(camera_id)
+    try:
+        session = start_profile(camera_id, mode, seconds, Config.PROFILE_DIR, threads)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 409
+    return jsonify(session.stats()), 202
+
+
+@detection.route("/profile/<session_id>", methods=["GET"])
+@login_required
+@admin_required
+def get_profiling(session_id):
+    session = profile_sessions.get(session_id)
+    if session is None:
+        return jsonify({"error": "Profile not found"}), 404
+    return jsonify(session.stats())
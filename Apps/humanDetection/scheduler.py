@@ -0,0 +1,73 @@
+import threading
+import time
+
+
+class DetectionScheduler:
+    # weighted fair queueing of detection slots. Each camera's virtual time
+    # advances by the detection time it used divided by its weight, a free
+    # slot goes to the waiting camera that is furthest behind.
+    def __init__(self, slots=1):
+        self.slots = max(1, slots)
+        self.busy = 0
+        self.clock = 0.0
+        self.condition = threading.Condition()
+        self.weights = {}
+        self.virtual = {}
+        self.waiting = {}
+        self.granted = {}
+        self.denied = {}
+        self.seconds = {}
+
+    def register(self, camera_id, priority=0):
+        with self.condition:
+            self.weights[camera_id] = 1 + max(0, int(priority or 0))
+            self.virtual.setdefault(camera_id, self.clock)
+
+    def unregister(self, camera_id):
+        with self.condition:
+            for table in (self.weights, self.virtual, self.granted, self.denied, self.seconds):
+                table.pop(camera_id, None)
+            self.condition.notify_all()
+
+    def _next(self):
+        return min(self.waiting, key=lambda camera_id: (self.virtual[camera_id], self.waiting[camera_id]))
+
+    def acquire(self, camera_id, timeout=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self.condition:
+            self.weights.setdefault(camera_id, 1)
+            # a camera returning from idle gets no credit for the time it was away
+            self.virtual[camera_id] = max(self.virtual.get(camera_id, 0.0), self.clock)
+            self.waiting[camera_id] = time.monotonic()
+            try:
+                while self.busy >= self.slots or self._next() != camera_id:
+                    remaining = None if deadline is None else deadline - time.monotonic()
+                    if remaining is not None and remaining <= 0:
+                        self.denied[camera_id] = self.denied.get(camera_id, 0) + 1
+                        return False
+                    self.condition.wait(remaining)
+            finally:
+                del self.waiting[camera_id]
+                self.condition.notify_all()
+            self.busy += 1
+            self.clock = self.virtual[camera_id]
+            self.granted[camera_id] = self.granted.get(camera_id, 0) + 1
+            return True
+
+    def release(self, camera_id, elapsed):
+        with self.condition:
+            self.busy -= 1
+            if camera_id in self.virtual:
+                self.virtual[camera_id] += elapsed / self.weights.get(camera_id, 1)
+                self.seconds[camera_id] = self.seconds.get(camera_id, 0.0) + elapsed
+            self.condition.notify_all()
+
+    def stats(self, camera_id=None):
+        if camera_id is not None:
+            return {
+                'weight': self.weights.get(camera_id),
+                'granted': self.granted.get(camera_id, 0),
+                'denied': self.denied.get(camera_id, 0),
+                'seconds': round(self.seconds.get(camera_id, 0.0), 3)
+            }
+        return {'slots': self.slots, 'busy': self.busy, 'waiting': len(self.waiting)}
@@ -0,0 +1,84 @@
+import threading
+from config import Config
+from .models import Camera
+from .webrtc_service import frame_manager, scheduler, set_counting_geometry, start_camera_for, client_count
+
+
+class CameraSupervisor:
+    # keeps every active camera running whether or not anyone is watching,
+    # viewers attach to the running pipeline through create_offer
+    def __init__(self, app, interval=10.0):
+        self.app = app
+        self.interval = interval
+        self.sources = {}
+        self.stopping = {}
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def sync(self):
+        with self.app.app_context():
+            cameras = Camera.query.filter_by(is_active=True).order_by(Camera.priority.desc()).all()
+        active = {str(camera.id): camera for camera in cameras}
+
+        for camera_id in list(self.sources):
+            if camera_id not in active:
+                self.release(camera_id)
+
+        for camera_id, camera in active.items():
+            source = (camera.rtsp_url, camera.video_file, camera.detector_backend)
+            if camera_id in self.sources and self.sources[camera_id] != source:
+                # stopped even while watched, viewers stay attached and get
+                # the new source once it runs
+                print(f"Supervisor restarting camera {camera_id} for its new source")
+                self.stop_capture(camera_id)
+            stopping = self.stopping.get(camera_id)
+            if stopping is not None:
+                # the old capture still owns the camera's state, start over
+                # only once it has exited
+                stopping.join(Config.READ_TIMEOUT + 1)
+                if stopping.is_alive():
+                    continue
+                del self.stopping[camera_id]
+            if camera_id in self.sources:
+                try:
+                    set_counting_geometry(camera_id, camera.counting_geometry)
+                except ValueError as e:
+                    print(f"Invalid counting geometry for camera {camera_id}: {e}")
+                scheduler.register(camera_id, camera.priority)
+            if not frame_manager.is_running(camera_id):
+                print(f"Supervisor starting camera {camera_id}")
+                frame_manager.pinned.add(camera_id)
+                start_camera_for(camera_id, camera)
+            self.sources[camera_id] = source
+
+    def stop_capture(self, camera_id):
+        thread = frame_manager.processing_threads.get(camera_id)
+        self.sources.pop(camera_id, None)
+        frame_manager.stop_camera(camera_id)
+        if thread is not None:
+            self.stopping[camera_id] = thread
+
+    def release(self, camera_id):
+        self.sources.pop(camera_id, None)
+        frame_manager.pinned.discard(camera_id)
+        if client_count(camera_id) == 0:
+            frame_manager.stop_camera(camera_id)
+
+    def run(self):
+        while not self.stop_event.is_set():
+            try:
+                self.sync()
+            except Exception as e:
+                print(f"Supervisor sync error: {e}")
+            self.stop_event.wait(self.interval)
+        for camera_id in list(self.sources):
+            self.release(camera_id)
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run, name="camera-supervisor", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join(timeout=self.interval)
@@ -0,0 +1,74 @@
+import numpy as np
+
+
+class TrajectoryStore:
+    def __init__(self, history=32, capacity=64):
+        self.history = history
+        self.positions = np.zeros((capacity, history, 2), dtype=np.float64)
+        self.heads = np.zeros(capacity, dtype=np.int32)
+        self.lengths = np.zeros(capacity, dtype=np.int32)
+        self.slots = {}
+        self.free = list(range(capacity - 1, -1, -1))
+        self.peak = 0
+
+    def _grow(self):
+        capacity = len(self.heads)
+        self.positions = np.concatenate((self.positions, np.zeros_like(self.positions)))
+        self.heads = np.concatenate((self.heads, np.zeros_like(self.heads)))
+        self.lengths = np.concatenate((self.lengths, np.zeros_like(self.lengths)))
+        self.free.extend(range(2 * capacity - 1, capacity - 1, -1))
+
+    def _allocate(self, object_id):
+        if not self.free:
+            self._grow()
+        slot = self.free.pop()
+        self.heads[slot] = 0
+        self.lengths[slot] = 0
+        self.slots[object_id] = slot
+        self.peak = max(self.peak, len(self.slots))
+        return slot
+
+    def record(self, object_ids, points):
+        # appends the current positions and returns each track's previous
+        # one, new tracks get their current position back
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        previous = points.copy()
+        if len(points) == 0:
+            return previous
+
+        slots = np.array([self.slots.get(i, -1) for i in object_ids.tolist()], dtype=np.int64)
+        known = slots >= 0
+        if known.any():
+            existing = slots[known]
+            previous[known] = self.positions[existing, (self.heads[existing] - 1) % self.history]
+        for index in np.flatnonzero(~known).tolist():
+            slots[index] = self._allocate(int(object_ids[index]))
+
+        heads = self.heads[slots]
+        self.positions[slots, heads] = points
+        self.heads[slots] = (heads + 1) % self.history
+        self.lengths[slots] = np.minimum(self.lengths[slots] + 1, self.history)
+        return previous
+
+    def trajectory(self, object_id):
+        slot = self.slots.get(object_id)
+        if slot is None:
+            return np.empty((0, 2), dtype=np.float64)
+        length = self.lengths[slot]
+        order = (self.heads[slot] - length + np.arange(length)) % self.history
+        return self.positions[slot, order]
+
+    def release(self, object_ids):
+        for object_id in object_ids:
+            slot = self.slots.pop(int(object_id), None)
+            if slot is not None:
+                self.free.append(slot)
+
+    def stats(self):
+        return {
+            'tracks': len(self.slots),
+            'peak_tracks': self.peak,
+            'capacity': len(self.heads),
+            'history': self.history,
+            'bytes': self.positions.nbytes + self.heads.nbytes + self.lengths.nbytes
+        }
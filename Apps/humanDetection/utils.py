@@ -1,8 +1,92 @@
 import cv2
 import numpy as np
 import logging
+import threading
+
+HOG_WINDOW = (64, 128)
+
+DETECTION_DTYPE = np.dtype([
+    ('x', np.int32),
+    ('y', np.int32),
+    ('w', np.int32),
+    ('h', np.int32),
+    ('confidence', np.float32),
+])
+
+
+def empty_detections():
+    return np.empty(0, dtype=DETECTION_DTYPE)
+
+
+def make_detections(boxes, weights, threshold=0.5):
+    boxes = np.asarray(boxes, dtype=np.int32).reshape(-1, 4)
+    weights = np.asarray(weights, dtype=np.float32).reshape(-1)
+    keep = weights > threshold
+    detections = np.empty(int(keep.sum()), dtype=DETECTION_DTYPE)
+    detections['x'] = boxes[keep, 0]
+    detections['y'] = boxes[keep, 1]
+    detections['w'] = boxes[keep, 2]
+    detections['h'] = boxes[keep, 3]
+    detections['confidence'] = weights[keep]
+    return detections
+
+
+def non_max_suppression(detections, iou_threshold=0.4):
+    if len(detections) < 2:
+        return detections
+    x0 = detections['x'].astype(np.float32)
+    y0 = detections['y'].astype(np.float32)
+    x1 = x0 + detections['w']
+    y1 = y0 + detections['h']
+    areas = (x1 - x0) * (y1 - y0)
+    order = np.argsort(-detections['confidence'], kind='stable')
+
+    keep = []
+    while order.size:
+        best = order[0]
+        keep.append(best)
+        rest = order[1:]
+        w = np.clip(np.minimum(x1[best], x1[rest]) - np.maximum(x0[best], x0[rest]), 0, None)
+        h = np.clip(np.minimum(y1[best], y1[rest]) - np.maximum(y0[best], y0[rest]), 0, None)
+        overlap = w * h
+        iou = overlap / (areas[best] + areas[rest] - overlap)
+        order = rest[iou <= iou_threshold]
+    return detections[np.sort(keep)]
+
+
+def centroids(detections):
+    return np.stack((
+        detections['x'] + detections['w'] // 2,
+        detections['y'] + detections['h'] // 2
+    ), axis=1)
+
+
+class DetectorBackend:
+    name = None
+    batched = False
+
+    def detect_humans(self, frame, params=None):
+        raise NotImplementedError
+
+    def detect_batch(self, frames, params=None):
+        params = params or [None] * len(frames)
+        return [self.detect_humans(frame, p) for frame, p in zip(frames, params)]
+
+    def draw_detections(self, frame, detections):
+        try:
+            for x, y, w, h, confidence in detections.tolist():
+                cv2.rectangle(frame, (x, y), (x + w, y + h), (0, 255, 0), 2)
+                cv2.putText(frame, f"Human: {confidence:.2f}", 
+                           (x, y - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
+            
+            return frame
+        except Exception as e:
+            return frame
+
+
+class HumanDetector(DetectorBackend):
+    name = 'hog'
 
-class HumanDetector:
     def __init__(self):
         try:
             self.hog = cv2.HOGDescriptor()
@@ -10,33 +94,127 @@ class HumanDetector:
         except Exception as e:
             raise
     
-    def detect_humans(self, frame):
+    def detect_humans(self, frame, params=None):
+        params = params or {}
         try:
             gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-            boxes, weights = self.hog.detectMultiScale(gray, winStride=(8,8))
-            
-            detections = []
-            for i, (x, y, w, h) in enumerate(boxes):
-                if weights[i] > 0.5:
-                    detections.append({
-                        'x': int(x),
-                        'y': int(y),
-                        'w': int(w),
-                        'h': int(h),
-                        'confidence': float(weights[i])
-                    })
-            return detections
+            boxes, weights = self.hog.detectMultiScale(
+                gray,
+                winStride=params.get('win_stride', (8,8)),
+                scale=params.get('pyramid_scale', 1.05)
+            )
+            return non_max_suppression(make_detections(boxes, weights, 0.5))
         except Exception as e:
+            return empty_detections()
+
+
+class DnnDetector(DetectorBackend):
+    # expects an SSD-style person model (e.g. MobileNet-SSD) whose output is
+    # a DetectionOutput blob of [image_id, class_id, confidence, x1, y1, x2, y2]
+    name = 'dnn'
+    batched = True
+
+    def __init__(self, model, config=None, input_size=(300, 300), scale=1 / 127.5,
+                 mean=(127.5, 127.5, 127.5), swap_rb=False, person_class=15, threshold=0.5):
+        self.net = cv2.dnn.readNet(model, config or '')
+        self.net.setPreferableBackend(cv2.dnn.DNN_BACKEND_OPENCV)
+        self.net.setPreferableTarget(cv2.dnn.DNN_TARGET_CPU)
+        self.input_size = tuple(input_size)
+        self.scale = scale
+        self.mean = mean
+        self.swap_rb = swap_rb
+        self.person_class = person_class
+        self.threshold = threshold
+        # one Net is shared by every camera thread, its input blob is not
+        self.lock = threading.Lock()
+
+    def detect_humans(self, frame, params=None):
+        return self.detect_batch([frame])[0]
+
+    def detect_batch(self, frames, params=None):
+        if not frames:
             return []
-    
-    def draw_detections(self, frame, detections):
         try:
-            for detection in detections:
-                x, y, w, h = detection['x'], detection['y'], detection['w'], detection['h']
-                cv2.rectangle(frame, (x, y), (x + w, y + h), (0, 255, 0), 2)
-                cv2.putText(frame, f"Human: {detection['confidence']:.2f}", 
-                           (x, y - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
-            
-            return frame
+            blob = cv2.dnn.blobFromImages(frames, self.scale, self.input_size, self.mean,
+                                          swapRB=self.swap_rb, crop=False)
+            with self.lock:
+                self.net.setInput(blob)
+                output = self.net.forward().reshape(-1, 7)
         except Exception as e:
-            return frame
\ No newline at end of file
+            print(f"DNN detection error: {e}")
+            return [empty_detections() for _ in frames]
+
+        output = output[(output[:, 1] == self.person_class) & (output[:, 2] > self.threshold)]
+        image_ids = output[:, 0].astype(np.int64)
+        results = []
+        for image_id, frame in enumerate(frames):
+            rows = output[image_ids == image_id]
+            height, width = frame.shape[:2]
+            x1 = np.clip(rows[:, 3] * width, 0, width).astype(np.int32)
+            y1 = np.clip(rows[:, 4] * height, 0, height).astype(np.int32)
+            x2 = np.clip(rows[:, 5] * width, 0, width).astype(np.int32)
+            y2 = np.clip(rows[:, 6] * height, 0, height).astype(np.int32)
+            boxes = np.stack((x1, y1, x2 - x1, y2 - y1), axis=1)
+            valid = (boxes[:, 2] > 0) & (boxes[:, 3] > 0)
+            results.append(non_max_suppression(make_detections(boxes[valid], rows[valid, 2], self.threshold)))
+        return results
+
+
+DETECTOR_BACKENDS = {
+    HumanDetector.name: HumanDetector,
+    DnnDetector.name: DnnDetector,
+}
+
+
+def create_detector(name=None, options=None):
+    backend = DETECTOR_BACKENDS.get(name or HumanDetector.name)
+    if backend is None:
+        raise ValueError(f"Unknown detector backend '{name}'")
+    return backend(**(options or {}).get(backend.name, {}))
+
+def scale_detections(detections, factor):
+    detections = detections.copy()
+    for field in ('x', 'y', 'w', 'h'):
+        detections[field] = np.rint(detections[field] * factor)
+    return detections
+
+
+def detect_in_regions(detect, frame, regions):
+    parts = []
+    for x0, y0, x1, y1 in regions:
+        detections = detect(frame[y0:y1, x0:x1])
+        detections['x'] += x0
+        detections['y'] += y0
+        parts.append(detections)
+    if not parts:
+        return empty_detections()
+    return non_max_suppression(np.concatenate(parts))
+
+
+def grow_regions(regions, bounds, min_size=HOG_WINDOW):
+    # widens regions smaller than min_size around their centre, within bounds
+    bx0, by0, bx1, by1 = bounds
+    result = []
+    for x0, y0, x1, y1 in regions:
+        for axis, size in enumerate(min_size):
+            low, high = (x0, x1) if axis == 0 else (y0, y1)
+            lower, upper = (bx0, bx1) if axis == 0 else (by0, by1)
+            if high - low < size:
+                low = max(lower, min((low + high - size) // 2, upper - size))
+                high = min(upper, low + size)
+            if axis == 0:
+                x0, x1 = low, high
+            else:
+                y0, y1 = low, high
+        result.append((x0, y0, x1, y1))
+    return result
+
+
+def intersect_regions(regions, bounds, min_size=HOG_WINDOW):
+    bx0, by0, bx1, by1 = bounds
+    result = []
+    for x0, y0, x1, y1 in regions:
+        x0, y0, x1, y1 = max(x0, bx0), max(y0, by0), min(x1, bx1), min(y1, by1)
+        if x1 - x0 >= min_size[0] and y1 - y0 >= min_size[1]:
+            result.append((x0, y0, x1, y1))
+    return result
@@ -0,0 +1,203 @@
+import math
+import multiprocessing
+import os
+import queue
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+import cv2
+from config import Config
+from .decoder import PyAVSource
+from .models import Detection, db
+from .registry import prune_finished
+from .rollups import apply_rollups
+
+
+MAX_JOBS = 50
+
+analysis_jobs = {}
+_progress = None
+
+
+def _init_worker(progress):
+    global _progress
+    from . import webrtc_service
+    # segments run side by side, one core each and no shared detection pool
+    cv2.setNumThreads(1)
+    webrtc_service.engine = None
+    webrtc_service.in_camera_process = True
+    _progress = progress
+
+
+def analyse_segment(task):
+    # counts crossings in [start, end). Tracking starts warmup seconds earlier
+    # so people already in view at the boundary carry their track over instead
+    # of appearing as new tracks; crossings before start belong to the
+    # previous segment
+    from . import webrtc_service as ws
+    job_id, camera_id, index, path, start, end, final, warmup, backend, geometry = task
+    key = f"{camera_id}:{job_id}:{index}"
+    begin = max(0.0, start - warmup)
+    source = PyAVSource(path, threads=1)
+    if begin > 0:
+        source.seek(begin)
+    ws.set_counting_geometry(key, geometry)
+    ws.camera_backends[key] = backend or Config.DETECTOR_BACKEND
+
+    events = []
+    frames = 0
+    counted = (0, 0)
+    try:
+        while source.grab():
+            media_time = source.time
+            if media_time is None or media_time < begin:
+                continue
+            # the last frame can end slightly past the reported duration
+            if media_time >= end and not final:
+                break
+            _, image = source.retrieve()
+            job = ws.FrameJob(key, image)
+            for stage in (ws.preprocess_frame, ws.detect_frame, ws.track_frame):
+                stage(job)
+            counts = ws.entry_exit_count[key]
+            entered, exited = counts["entry"] - counted[0], counts["exit"] - counted[1]
+            counted = (counts["entry"], counts["exit"])
+            if media_time >= start and (entered or exited):
+                events.append((media_time, entered, exited))
+            frames += 1
+            if frames % 25 == 0:
+                _progress.put((job_id, index, max(0.0, media_time - start), frames))
+    finally:
+        source.release()
+        ws.clear_camera_state(key)
+    _progress.put((job_id, index, end - start, frames))
+    return index, events
+
+
+class AnalysisJob:
+    def __init__(self, camera_id, path, start_time=None, workers=None, segment_seconds=None):
+        self.id = uuid.uuid4().hex[:12]
+        self.camera_id = camera_id
+        self.path = path
+        self.start_time = start_time
+        self.workers = workers or Config.ANALYSIS_WORKERS or os.cpu_count() or 1
+        self.segment_seconds = segment_seconds or Config.ANALYSIS_SEGMENT
+        self.state = 'queued'
+        self.error = None
+        self.duration = None
+        self.segments = 0
+        self.processed = {}
+        self.frames = {}
+        self.entries = 0
+        self.exits = 0
+        self.started = None
+        self.finished = None
+
+    def stats(self):
+        elapsed = ((self.finished or time.time()) - self.started) if self.started else 0.0
+        frames = sum(self.frames.values())
+        done = sum(self.processed.values())
+        return {
+            'id': self.id,
+            'camera_id': self.camera_id,
+            'state': self.state,
+            'error': self.error,
+            'progress': round(min(1.0, done / self.duration), 4) if self.duration else 0.0,
+            'frames': frames,
+            'fps': round(frames / elapsed, 1) if elapsed > 0 else 0.0,
+            'realtime_factor': round(done / elapsed, 2) if elapsed > 0 else 0.0,
+            'segments': self.segments,
+            'workers': self.workers,
+            'entries': self.entries,
+            'exits': self.exits,
+            'elapsed': round(elapsed, 1)
+        }
+
+
+def _recording_start(source, path):
+    created = source.container.metadata.get('creation_time')
+    if created:
+        try:
+            return datetime.fromisoformat(created.replace('Z', '+00:00')).replace(tzinfo=None)
+        except ValueError:
+            pass
+    # without metadata assume the file was written when the recording ended
+    return datetime.utcfromtimestamp(os.path.getmtime(path)) - timedelta(seconds=source.duration or 0)
+
+
+def run_analysis(app, job, backend=None, geometry=None):
+    job.state = 'running'
+    job.started = time.time()
+    try:
+        source = PyAVSource(job.path, threads=1)
+        job.duration = source.duration
+        start_time = job.start_time or _recording_start(source, job.path)
+        source.release()
+
+        if job.duration:
+            job.segments = max(1, math.ceil(job.duration / job.segment_seconds))
+            bounds = [(i * job.segment_seconds, min(job.duration, (i + 1) * job.segment_seconds))
+                      for i in range(job.segments)]
+        else:
+            job.segments = 1
+            bounds = [(0.0, 0.0)]
+        tasks = [(job.id, job.camera_id, index, job.path, start, end, index == len(bounds) - 1,
+                  Config.ANALYSIS_WARMUP, backend, geometry)
+                 for index, (start, end) in enumerate(bounds)]
+
+        context = multiprocessing.get_context('spawn')
+        progress = context.Queue()
+        with context.Pool(min(job.workers, len(tasks)), _init_worker, (progress,)) as pool:
+            result = pool.map_async(analyse_segment, tasks)
+            while not result.ready():
+                _drain(job, progress, 0.5)
+            segments = result.get()
+            _drain(job, progress, 0.5)
+
+        rows = []
+        for _, events in sorted(segments):
+            for media_time, entered, exited in events:
+                timestamp = start_time + timedelta(seconds=media_time)
+                rows += [{'camera_id': int(job.camera_id), 'timestamp': timestamp, 'confidence': None,
+                          'entry_people': 1, 'exit_people': 0} for _ in range(entered)]
+                rows += [{'camera_id': int(job.camera_id), 'timestamp': timestamp, 'confidence': None,
+                          'entry_people': 0, 'exit_people': 1} for _ in range(exited)]
+                job.entries += entered
+                job.exits += exited
+        with app.app_context():
+            if rows:
+                db.session.execute(db.insert(Detection), rows)
+                apply_rollups(db.session, rows)
+            db.session.commit()
+        job.state = 'done'
+    except Exception as e:
+        print(f"Analysis job {job.id} failed: {e}")
+        job.state = 'failed'
+        job.error = str(e)
+    finally:
+        job.finished = time.time()
+
+
+def _drain(job, progress, timeout):
+    while True:
+        try:
+            _, index, processed, frames = progress.get(timeout=timeout)
+        except queue.Empty:
+            return
+        job.processed[index] = processed
+        job.frames[index] = frames
+        timeout = 0
+
+
+def start_analysis(app, camera, start_time=None, workers=None, segment_seconds=None):
+    job = AnalysisJob(str(camera.id), camera.video_file, start_time, workers, segment_seconds)
+    analysis_jobs[job.id] = job
+    prune_finished(analysis_jobs, MAX_JOBS)
+    threading.Thread(
+        target=run_analysis,
+        args=(app, job, camera.detector_backend, camera.counting_geometry),
+        name=f"analysis-{job.id}",
+        daemon=True
+    ).start()
+    return job
@@ -4,24 +4,101 @@ import numpy as np
 import threading
 from collections import defaultdict
 from aiortc import RTCPeerConnection, VideoStreamTrack, RTCSessionDescription
+from aiortc.mediastreams import VIDEO_CLOCK_RATE, VIDEO_TIME_BASE
 from av import VideoFrame
-from .utils import HumanDetector
-from .models import Detection, db, Camera
+from .utils import DETECTOR_BACKENDS, HumanDetector, create_detector, detect_in_regions, empty_detections, centroids, scale_detections, intersect_regions, grow_regions, HOG_WINDOW
+from .detection_engine import DetectionEngine
+from .models import Camera
 from .centroid_tracker import CentroidTracker
+from .kalman_tracker import KalmanTracker
+from .motion_gate import MotionGate
+from .optical_flow import FlowTracker
+from .budget import FrameBudgetController
+from .trajectory_store import TrajectoryStore
+from .counting import CountingGeometry, default_geometry
+from .pipeline import Pipeline
+from .frame_ring import FrameRing, MAX_FEATURES
+from .decoder import open_source
+from .frames import VersionedFrame, FrameSignal
+from .broadcast import CameraBroadcaster, prefer_h264
+from .scheduler import DetectionScheduler
+from .connection import CameraConnection, ConnectionWatchdog
+from .metrics import Counter, Histogram, Collected
+from . import profiler
+from .detection_writer import detection_writer
 from app import socketio
-from multiprocessing import Process
+import multiprocessing
+import os
 import time
-from threading import Thread
+from config import Config
 
 
 
+if Config.DETECTOR_BACKEND not in DETECTOR_BACKENDS:
+    raise ValueError(f"Unknown DETECTOR_BACKEND '{Config.DETECTOR_BACKEND}', use one of {', '.join(DETECTOR_BACKENDS)}")
+
 camera_clients = defaultdict(dict)  
 video_tracks = {}
 detector = HumanDetector()
+detectors = {detector.name: detector}
+camera_backends = {}
+engine = DetectionEngine(Config.DETECTION_WORKERS, Config.DETECTION_TIMEOUT, Config.DETECTOR_OPTIONS) if Config.DETECTION_WORKERS > 0 else None
+scheduler = DetectionScheduler(Config.DETECTION_SLOTS or int((os.cpu_count() or 1) * Config.CPU_BUDGET))
 trackers = {}
 entry_exit_count = {}
 line_position = 300
-previous_x = defaultdict(dict)
+default_counting_geometry = CountingGeometry(default_geometry(line_position))
+counting_geometries = {}
+feature_counts = defaultdict(dict)
+trajectories = {}
+motion_gates = {}
+flow_trackers = {}
+budget_controllers = {}
+in_camera_process = False
+offline_frames = {}
+broadcasters = {}
+watchdog = ConnectionWatchdog()
+
+stage_seconds = Histogram('camera_stage_seconds', "Time spent per frame in each pipeline stage", ('camera', 'stage'))
+send_latency = Histogram('camera_publish_to_send_seconds', "Time from publishing a frame to handing it to the viewers", ('camera',))
+frames_skipped = Counter('camera_frames_skipped_total', "Frames grabbed without decoding while the pipeline was busy", ('camera',))
+
+
+def set_counting_geometry(camera_id, data, version=0):
+    # swapping the reference is picked up by the camera thread on its next
+    # frame, a camera process is sent the new geometry
+    camera_id = str(camera_id)
+    if data:
+        counting_geometries[camera_id] = CountingGeometry(data, version)
+    else:
+        counting_geometries.pop(camera_id, None)
+    if not in_camera_process:
+        frame_manager.send_geometry(camera_id)
+
+
+def init_camera_state(camera_id):
+    if camera_id not in trackers:
+        tracker_class = KalmanTracker if Config.TRACKER_MODE == 'kalman' else CentroidTracker
+        trackers[camera_id] = tracker_class(
+            max_disappeared=15,
+            max_distance=Config.TRACKER_MAX_DISTANCE,
+            matching=Config.TRACKER_MATCHING
+        )
+        entry_exit_count[camera_id] = {"entry": 0, "exit": 0}
+        trajectories[camera_id] = TrajectoryStore(Config.TRAJECTORY_HISTORY)
+        trackers[camera_id].deregister_listeners.append(trajectories[camera_id].release)
+    if Config.MOTION_GATE and camera_id not in motion_gates:
+        motion_gates[camera_id] = MotionGate()
+    if Config.DETECTION_INTERVAL > 1 and camera_id not in flow_trackers:
+        flow_trackers[camera_id] = FlowTracker(Config.DETECTION_INTERVAL, Config.DETECTION_CROWD_STEP)
+    if Config.FRAME_BUDGET_FPS > 0 and camera_id not in budget_controllers:
+        budget_controllers[camera_id] = FrameBudgetController(Config.FRAME_BUDGET_FPS, Config.FRAME_BUDGET_CPU)
+
+
+def clear_camera_state(camera_id):
+    for state in (trackers, entry_exit_count, feature_counts, trajectories, motion_gates,
+                  flow_trackers, budget_controllers, counting_geometries, camera_backends):
+        state.pop(camera_id, None)
 
 
 class SharedFrameManager:
@@ -30,39 +107,149 @@ class SharedFrameManager:
         self.locks = {}   
         self.processing_threads = {}  
         self.running = {}  
+        self.pipelines = {}
+        self.rings = {}
+        self.processes = {}
+        self.signals = {}
+        self.pinned = set()
+        self.connections = {}
         
-    def start_camera(self, camera_id, rtsp_url, video_file=None):
+    def start_camera(self, camera_id, rtsp_url, video_file=None, backend=None):
         camera_id = str(camera_id)
         
         if camera_id in self.processing_threads and self.running.get(camera_id):
             return
+
+        if Config.CAMERA_EXECUTION == 'process':
+            self.start_camera_process(camera_id, rtsp_url, video_file, backend)
+            return
             
+        camera_backends[camera_id] = backend or Config.DETECTOR_BACKEND
         self.locks[camera_id] = threading.Lock()
-        self.frames[camera_id] = offline_frame(camera_id)
+        self.signals.setdefault(camera_id, FrameSignal())
+        self._store(camera_id, offline_frame(camera_id))
         self.running[camera_id] = True
-        if camera_id not in trackers:
-            trackers[camera_id] = CentroidTracker(max_disappeared=15)
-            entry_exit_count[camera_id] = {"entry": 0, "exit": 0}
-            previous_x[camera_id] = {}
+        init_camera_state(camera_id)
+        if engine is not None:
+            engine.start()
         
         thread = threading.Thread(
             target=self._process_camera,
             args=(camera_id, rtsp_url, video_file),
+            name=f"camera-{camera_id}-capture",
             daemon=True
         )
         self.processing_threads[camera_id] = thread
         thread.start()
 
 
-    def start_camera_process(camera_id, rtsp_url, video_file=None):
+    def start_camera_process(self, camera_id, rtsp_url, video_file=None, backend=None):
         camera_id = str(camera_id)
-        if frame_manager.is_running(camera_id):
-            print(f"Camera {camera_id} already running")
+        ring = FrameRing(slots=Config.FRAME_RING_SLOTS)
+        ring.write(offline_frame(camera_id))
+        geometry = counting_geometries.get(camera_id, default_counting_geometry)
+        context = multiprocessing.get_context('spawn')
+        stop_event = context.Event()
+        geometry_updates, updates = context.Pipe(duplex=False)
+        process = context.Process(
+            target=run_camera_process,
+            args=(camera_id, rtsp_url, video_file, backend, geometry.data, ring.name, ring.slots, stop_event,
+                  geometry_updates),
+            name=f"camera-{camera_id}",
+            daemon=True
+        )
+        process.start()
+        geometry_updates.close()
+
+        self.locks[camera_id] = threading.Lock()
+        self.signals.setdefault(camera_id, FrameSignal())
+        self.rings[camera_id] = ring
+        # every geometry the process was sent by version, the ring says which
+        # one its counts are laid out for
+        geometries = {0: geometry}
+        self.processes[camera_id] = (process, stop_event, updates, geometries)
+        self.running[camera_id] = True
+        # counts carry over a restart like in thread mode, the process
+        # reports from zero and its deltas are added on top
+        entry_exit_count.setdefault(camera_id, {"entry": 0, "exit": 0})
+        feature_counts.setdefault(camera_id, {})
+        thread = threading.Thread(
+            target=self._monitor_camera_process,
+            args=(camera_id, ring, process, stop_event, updates, geometries),
+            daemon=True
+        )
+        self.processing_threads[camera_id] = thread
+        thread.start()
+
+    def _monitor_camera_process(self, camera_id, ring, process, stop_event, updates, geometries):
+        lock = self.locks[camera_id]
+        signal = self.signals[camera_id]
+        reported = {}
+        last = (0, ring.counts()[1])
+        while self.running.get(camera_id, False) and process.is_alive():
+            time.sleep(0.01)
+            sequence = int(ring.header[0])
+            if sequence != signal.version:
+                signal.notify(sequence)
+            version, counts = ring.counts()
+            if version is not None and (version != last[0] or (counts != last[1]).any()):
+                self._report_process_counts(camera_id, reported, geometries[version], counts)
+                last = (version, counts)
+
+        stop_event.set()
+        process.join(timeout=5.0)
+        if process.is_alive():
+            process.terminate()
+            process.join()
+        version, counts = ring.counts()
+        if version is not None:
+            self._report_process_counts(camera_id, reported, geometries[version], counts)
+
+        # the camera may have been restarted meanwhile, only drop our own state
+        with lock:
+            if self.rings.get(camera_id) is ring:
+                self.running[camera_id] = False
+                del self.rings[camera_id]
+                del self.processes[camera_id]
+            ring.close()
+            updates.close()
+        print(f"Camera {camera_id} process stopped with exit code {process.exitcode}")
+
+    def _report_process_counts(self, camera_id, reported, geometry, counts):
+        # the process counts up from zero and keeps a feature's count by name
+        # across geometry changes, reported holds what was already added here
+        counts = counts.tolist()
+        current = {None: (counts[0], counts[1])}
+        for index, name in enumerate(geometry.names[:MAX_FEATURES]):
+            current[name] = (counts[2 + 2 * index], counts[3 + 2 * index])
+        totals = entry_exit_count.setdefault(camera_id, {"entry": 0, "exit": 0})
+        features = feature_counts.setdefault(camera_id, {})
+        for name, (entries, exits) in current.items():
+            before = reported.get(name, (0, 0))
+            if (entries, exits) == before:
+                continue
+            reported[name] = (entries, exits)
+            target = totals if name is None else features.setdefault(name, {"entry": 0, "exit": 0})
+            target["entry"] += entries - before[0]
+            target["exit"] += exits - before[1]
+
+    def send_geometry(self, camera_id):
+        # a running camera process counts with the geometry it was last sent
+        if camera_id not in self.processes:
             return
-        frame_manager.start_camera(camera_id, rtsp_url, video_file)
-        p = Process(target=frame_manager._process_camera, args=(camera_id, rtsp_url, video_file))
-        p.daemon = True
-        p.start()
+        with self.locks[camera_id]:
+            if camera_id not in self.processes:
+                return
+            _, _, updates, geometries = self.processes[camera_id]
+            geometry = counting_geometries.get(camera_id, default_counting_geometry)
+            version = max(geometries)
+            if geometry.data == geometries[version].data:
+                return
+            geometries[version + 1] = geometry
+            try:
+                updates.send((version + 1, geometry.data))
+            except (OSError, ValueError) as e:
+                print(f"Cannot send counting geometry to camera {camera_id}: {e}")
     
     def _process_camera(self, camera_id, rtsp_url, video_file):
         if video_file:
@@ -71,35 +258,57 @@ class SharedFrameManager:
             source = 0
         else:
             source = rtsp_url
-        for _ in range(5):
-            cap = cv2.VideoCapture(source)
-            if video_file:
-                cap.set(cv2.CAP_PROP_FPS, 30)
-            if cap.isOpened():
-                break
-            cv2.waitKey(1000)
-
-        if not cap.isOpened():
-            print(f"Failed to open camera {camera_id}")
-            self.running[camera_id] = False
+        connection = CameraConnection(
+            camera_id,
+            lambda: open_source(source, Config.DECODER_BACKEND, threads=Config.DECODER_THREADS,
+                                timeout=(Config.OPEN_TIMEOUT, Config.READ_TIMEOUT)),
+            Config.RECONNECT_BASE_DELAY, Config.RECONNECT_MAX_DELAY, Config.STALL_TIMEOUT
+        )
+        self.connections[camera_id] = connection
+        running = lambda: self.running.get(camera_id, False)
+        cap = connection.connect(running)
+        if cap is None:
+            print(f"Camera {camera_id} stopped before it connected")
             return
+        watchdog.add(connection)
 
         prev_time = time.time()
-        process_thread = None
+        pipeline = Pipeline(
+            f"camera-{camera_id}",
+            FRAME_STAGES + [('publish', self._publish)],
+            Config.PIPELINE_QUEUE_SIZE,
+            Config.PIPELINE_DROP_POLICY
+        )
+        self.pipelines[camera_id] = pipeline
+        pipeline.start()
+        busy = 0
 
         while self.running.get(camera_id, False):
-            ret, frame = cap.read()
+            if connection.stall_detected:
+                self._store(camera_id, offline_frame(camera_id))
+                cap = connection.reconnect(running)
+                if cap is None:
+                    break
+
+            # while the stages are backed up a converted frame would only be
+            # dropped, so just advance the stream and decode less of it
+            busy = busy + 1 if pipeline.saturated() else 0
+            # files are paced per frame, jumping between keyframes would fast-forward them
+            keyframes_only = busy >= Config.DECODER_KEYFRAME_AFTER and not video_file
+            cap.set_skip(2 if keyframes_only else 1 if busy else 0)
+            decode_start = time.perf_counter()
+            ret = cap.grab()
+            if ret and busy == 0:
+                ret, frame = cap.retrieve()
+                if ret:
+                    stage_seconds.observe(time.perf_counter() - decode_start, camera_id, 'decode')
+                    pipeline.submit(FrameJob(camera_id, frame))
+            elif ret:
+                frames_skipped.inc(camera_id)
             if ret:
-                frame = cv2.resize(frame, (640, 480))
-                if process_thread is None or not process_thread.is_alive():
-                    process_thread = Thread(
-                        target=process_frame_thread,
-                        args=(frame, camera_id, self.locks[camera_id], self.frames)
-                    )
-                    process_thread.start()
+                connection.frame()
                 if video_file:
-                    fps = cap.get(cv2.CAP_PROP_FPS) or 30
-                    frame_delay = max(1.0 / min(fps, 30), 0.03)
+                    frame_delay = max(1.0 / min(cap.fps, 30), 0.03)
                     now = time.time()
                     diff = now - prev_time
                     if diff < frame_delay:
@@ -107,45 +316,141 @@ class SharedFrameManager:
                     prev_time = time.time()
 
             else:
-                with self.locks[camera_id]:
-                    self.frames[camera_id] = offline_frame(camera_id)
+                self._store(camera_id, offline_frame(camera_id))
 
                 if video_file:
-                    cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                    cap.rewind()
                 else:
-                    time.sleep(0.1)
-
-        cap.release()
+                    cap = connection.reconnect(running)
+                    if cap is None:
+                        break
+
+        watchdog.remove(connection)
+        connection.release()
+        pipeline.stop()
+        # a restarted camera may already have registered its new pipeline
+        if self.pipelines.get(camera_id) is pipeline:
+            del self.pipelines[camera_id]
+        if self.connections.get(camera_id) is connection:
+            del self.connections[camera_id]
+        if engine is not None:
+            engine.release(camera_id)
         print(f"Camera {camera_id} processing thread stopped")
     
-    def get_frame(self, camera_id):
+    def _publish(self, job):
+        finish_frame(job)
+        self._store(job.camera_id, job.frame)
+
+    def _store(self, camera_id, frame):
+        ring = self.rings.get(camera_id)
+        if ring is None:
+            # readers never lock, they pick up whichever frame the reference points at
+            with self.locks[camera_id]:
+                previous = self.frames.get(camera_id)
+                published = VersionedFrame(frame, previous.version + 1 if previous else 1)
+                self.frames[camera_id] = published
+            self.signals[camera_id].notify(published.version)
+            return
+
+        # inside a camera process, publish the frame and counts to the parent
+        counts = [entry_exit_count[camera_id]["entry"], entry_exit_count[camera_id]["exit"]]
+        features = feature_counts[camera_id]
+        geometry = counting_geometries.get(camera_id, default_counting_geometry)
+        for name in geometry.names[:MAX_FEATURES]:
+            feature = features.get(name, {})
+            counts += [feature.get("entry", 0), feature.get("exit", 0)]
+        ring.write(frame, counts, geometry.version)
+
+    def get_frame(self, camera_id, convert=None):
+        return self.latest(camera_id, convert)[1]
+
+    def latest(self, camera_id, convert=None):
+        # returns (version, image), the image is read-only and shared by all
+        # readers. convert is applied to it in place, for a ring slot it is
+        # repeated if the slot was overwritten meanwhile
         camera_id = str(camera_id)
-        if camera_id not in self.locks:
-            return offline_frame(camera_id)
-        
-        if camera_id not in self.frames:
-            return offline_frame(camera_id)
-        
+        convert = convert or (lambda image: image)
+        ring = self.rings.get(camera_id)
+        if ring is None:
+            published = self.frames.get(camera_id)
+            if published is None:
+                return None, convert(offline_frame(camera_id))
+            return published.version, convert(published.image)
+
         with self.locks[camera_id]:
-            frame = self.frames.get(camera_id, offline_frame(camera_id)).copy()
-            return frame
+            if self.rings.get(camera_id) is ring:
+                for _ in range(ring.slots):
+                    sequence, image = ring.latest()
+                    if image is None:
+                        break
+                    result = convert(image)
+                    if ring.valid(sequence):
+                        return sequence, result
+        return None, convert(offline_frame(camera_id))
     
     def stop_camera(self, camera_id):
         camera_id = str(camera_id)
         self.running[camera_id] = False
+        connection = self.connections.get(camera_id)
+        if connection is not None:
+            connection.close()
+        if camera_id in self.processes:
+            self.processes[camera_id][1].set()
         if camera_id in self.processing_threads:
             del self.processing_threads[camera_id]
         print(f"Stopped camera {camera_id}")
     
+    def process_stats(self, camera_id):
+        if camera_id not in self.processes:
+            return None
+        process = self.processes[camera_id][0]
+        ring = self.rings.get(camera_id)
+        return {
+            'pid': process.pid,
+            'alive': process.is_alive(),
+            'frames': int(ring.header[0]) if ring is not None else None
+        }
+
+    def threads(self, camera_id):
+        # idents of the capture thread and the stage threads of one camera
+        camera_id = str(camera_id)
+        threads = [self.processing_threads.get(camera_id)]
+        pipeline = self.pipelines.get(camera_id)
+        if pipeline is not None:
+            threads += [stage.thread for stage in pipeline.stages]
+        return {thread.ident for thread in threads if thread is not None}
+
+    def published_at(self, camera_id, version):
+        published = self.frames.get(str(camera_id))
+        if published is None or published.version != version:
+            return None
+        return published.timestamp
+
     def is_running(self, camera_id):
 
         return self.running.get(str(camera_id), False)
 frame_manager = SharedFrameManager()
 
-def process_frame_thread(frame, camera_id, lock, frames):
-        processed = process_frame(frame, camera_id, detection_enabled=True)
-        with lock:
-            frames[camera_id] = processed.copy()
+
+def _pipeline_counts(key):
+    for camera_id, pipeline in list(frame_manager.pipelines.items()):
+        for stage, stats in pipeline.stats().items():
+            if key in stats:
+                yield (camera_id, stage), stats[key]
+
+
+Collected('camera_frames_processed_total', "Frames that left each pipeline stage", ('camera', 'stage'), 'counter',
+          lambda: _pipeline_counts('processed'))
+Collected('camera_frames_dropped_total', "Frames replaced in a full stage queue", ('camera', 'stage'), 'counter',
+          lambda: _pipeline_counts('dropped'))
+Collected('camera_viewers', "Connected WebRTC viewers", ('camera',), 'gauge',
+          lambda: [((camera_id,), len(clients)) for camera_id, clients in list(camera_clients.items())])
+
+
+def record_send_latency(camera_id, version):
+    published = frame_manager.published_at(camera_id, version)
+    if published is not None:
+        send_latency.observe(time.time() - published, camera_id)
 
 class CameraVideoTrack(VideoStreamTrack):
     def __init__(self, camera_id):
@@ -153,21 +458,34 @@ class CameraVideoTrack(VideoStreamTrack):
         self.camera_id = str(camera_id)
         self._running = True
         self._frame_count = 0
+        self._version = None
+        self._start = None
     
     async def recv(self):
         if not self._running:
             raise Exception("Track stopped")
-            
-        pts, time_base = await self.next_timestamp()
-        frame = frame_manager.get_frame(self.camera_id)
-        frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+
+        # wait for the next published frame instead of polling, an idle
+        # camera still gets its last frame resent to keep the peer decoding
+        signal = frame_manager.signals.get(self.camera_id)
+        if signal is not None:
+            await signal.wait(self._version, Config.TRACK_IDLE_RESEND)
+        elif self._start is not None:
+            await asyncio.sleep(Config.TRACK_IDLE_RESEND)
+
+        previous = self._version
+        self._version, av_frame = frame_manager.latest(self.camera_id, to_video_frame)
+        if self._start is None:
+            self._start = time.time()
         self._frame_count += 1
         if self._frame_count <= 3 or self._frame_count % 100 == 0:
-            print(f"Camera {self.camera_id} - Sending frame #{self._frame_count}, shape: {frame.shape}")
+            print(f"Camera {self.camera_id} - Sending frame #{self._frame_count}, shape: {(av_frame.height, av_frame.width)}")
         
-        av_frame = VideoFrame.from_ndarray(frame, format="rgb24")
-        av_frame.pts = pts
-        av_frame.time_base = time_base
+        av_frame.pts = int((time.time() - self._start) * VIDEO_CLOCK_RATE)
+        av_frame.time_base = VIDEO_TIME_BASE
+        # idle resends of the same frame are not new latency
+        if self._version != previous:
+            record_send_latency(self.camera_id, self._version)
         return av_frame
     
     def stop(self):
@@ -175,87 +493,284 @@ class CameraVideoTrack(VideoStreamTrack):
         super().stop()
 
 
-def save_detection(camera_id, is_entry):
+def to_video_frame(image):
+    # the encoder converts to yuv420p anyway, skip the intermediate rgb image
+    return VideoFrame.from_ndarray(image, format="bgr24")
+
+
+def run_camera_process(camera_id, rtsp_url, video_file, backend, geometry, ring_name, slots, stop_event,
+                       geometry_updates):
+    global engine, in_camera_process
+    # the process is the unit of parallelism, keep detection in-process and
+    # OpenCV on one thread so cameras do not compete for cores
+    engine = None
+    in_camera_process = True
+    cv2.setNumThreads(1)
+
+    ring = FrameRing(ring_name, slots)
+    set_counting_geometry(camera_id, geometry)
+    camera_backends[camera_id] = backend or Config.DETECTOR_BACKEND
+    frame_manager.locks[camera_id] = threading.Lock()
+    frame_manager.rings[camera_id] = ring
+    frame_manager.running[camera_id] = True
+    init_camera_state(camera_id)
+
+    def watch_stop():
+        stop_event.wait()
+        frame_manager.running[camera_id] = False
+
+    def watch_geometry():
+        while True:
+            try:
+                version, data = geometry_updates.recv()
+            except (EOFError, OSError):
+                return
+            try:
+                set_counting_geometry(camera_id, data, version)
+            except ValueError as e:
+                print(f"Invalid counting geometry for camera {camera_id}: {e}")
+
+    threading.Thread(target=watch_stop, daemon=True).start()
+    threading.Thread(target=watch_geometry, daemon=True).start()
     try:
-        new_detect = Detection(
-            camera_id=int(camera_id),
-            confidence=None,
-            entry_people=1 if is_entry else 0,
-            exit_people=0 if is_entry else 1
-        )
-        db.session.add(new_detect)
-        db.session.commit()
-    except Exception as e:
-        print("DB Error:", e)
+        frame_manager._process_camera(camera_id, rtsp_url, video_file)
+    finally:
+        frame_manager.rings.pop(camera_id, None)
+        ring.close()
 
 
-def process_frame(frame, camera_id, detection_enabled=True):
-    if frame is None:
-        return frame
-    
-    camera_id = str(camera_id)
-    if camera_id not in trackers:
-        trackers[camera_id] = CentroidTracker(max_disappeared=15)
-        entry_exit_count[camera_id] = {"entry": 0, "exit": 0}
-        previous_x[camera_id] = {}
-    
-    detections = []
-    if detection_enabled:
+def save_detection(camera_id, is_entry):
+    # queued for the background writer, frame threads never wait on the database
+    detection_writer.put(camera_id, is_entry)
+
+
+def get_detector(backend):
+    if backend not in detectors:
         try:
-            detections = detector.detect_humans(frame)
+            detectors[backend] = create_detector(backend, Config.DETECTOR_OPTIONS)
         except Exception as e:
-            print(f"Detection error camera {camera_id}: {e}")
-    
-    rects = []
-    for d in detections:
-        cx = int(d["x"] + d["w"] / 2)
-        cy = int(d["y"] + d["h"] / 2)
-        rects.append((cx, cy))
-    
-    objects = trackers[camera_id].update(rects)
-    
-    for object_id, (cx, cy) in objects.items():
-        prev_cx = previous_x[camera_id].get(object_id, cx)
-        if prev_cx < line_position <= cx:
-            entry_exit_count[camera_id]["entry"] += 1
-            save_detection(camera_id, True)
-        elif prev_cx > line_position >= cx:
-            entry_exit_count[camera_id]["exit"] += 1
-            save_detection(camera_id, False)
-        
-        previous_x[camera_id][object_id] = cx
-        cv2.circle(frame, (cx, cy), 4, (255, 0, 0), -1)
+            print(f"Detector backend {backend} unavailable, using hog: {e}")
+            detectors[backend] = detector
+    return detectors[backend]
+
+
+def detect_humans(camera_id, frame, regions=None, params=None):
+    params = params or {}
+    scale = params.get('scale', 1.0)
+    if scale < 1.0:
+        small = cv2.resize(frame, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        if regions is not None:
+            # crops that shrink below the detection window would find nothing,
+            # they are widened back to it in the smaller frame
+            height, width = small.shape[:2]
+            regions = [tuple(int(v * scale) for v in region) for region in regions]
+            regions = intersect_regions(grow_regions(regions, (0, 0, width, height)), (0, 0, width, height))
+        detections = detect_humans(camera_id, small, regions, dict(params, scale=1.0))
+        return scale_detections(detections, 1.0 / scale)
+    if regions is not None:
+        return detect_in_regions(lambda crop: detect_humans(camera_id, crop, None, params), frame, regions)
+    backend = camera_backends.get(camera_id, Config.DETECTOR_BACKEND)
+    if engine is not None:
+        return engine.detect(camera_id, frame, backend, params)
+    return get_detector(backend).detect_humans(frame, params)
+
+
+class FrameJob:
+    __slots__ = ('camera_id', 'frame', 'detection_enabled', 'geometry', 'gray', 'propagate',
+                 'regions', 'params', 'detections', 'points', 'timings')
+
+    def __init__(self, camera_id, frame, detection_enabled=True):
+        self.camera_id = str(camera_id)
+        self.frame = frame
+        self.detection_enabled = detection_enabled
+        self.geometry = default_counting_geometry
+        self.gray = None
+        self.propagate = False
+        self.regions = None
+        self.params = None
+        self.detections = empty_detections()
+        self.points = None
+        self.timings = {}
+
+
+def preprocess_frame(job):
+    camera_id = job.camera_id
+    init_camera_state(camera_id)
+    job.geometry = counting_geometries.get(camera_id, default_counting_geometry)
+    flow = flow_trackers.get(camera_id)
+    controller = budget_controllers.get(camera_id)
+    if flow is not None:
+        job.gray = cv2.cvtColor(job.frame, cv2.COLOR_BGR2GRAY)
+
+    job.propagate = flow is not None and not flow.due(len(trackers[camera_id]))
+    if controller is not None and not job.propagate:
+        job.propagate = controller.skip_frame()
+    if not job.detection_enabled or job.propagate:
+        return job
+
+    try:
+        if camera_id in motion_gates:
+            job.regions = motion_gates[camera_id].regions(job.frame)
+        if Config.COUNTING_BAND > 0:
+            margin = max(Config.COUNTING_BAND, HOG_WINDOW[0])
+            bands = job.geometry.regions(job.frame.shape, margin)
+            if job.regions is not None:
+                bands = [r for band in bands for r in intersect_regions(job.regions, band)]
+            job.regions = bands
+    except Exception as e:
+        print(f"Preprocess error camera {camera_id}: {e}")
+    job.params = controller.settings() if controller is not None else None
+    return job
+
+
+def detect_frame(job):
+    if job.detection_enabled and not job.propagate:
+        if not scheduler.acquire(job.camera_id, Config.DETECTION_SLOT_WAIT):
+            # no slot in time, carry the tracks forward like a skipped frame
+            job.propagate = True
+            return job
+        start = time.perf_counter()
+        try:
+            job.detections = detect_humans(job.camera_id, job.frame, job.regions, job.params)
+        except Exception as e:
+            print(f"Detection error camera {job.camera_id}: {e}")
+        finally:
+            scheduler.release(job.camera_id, time.perf_counter() - start)
+    return job
+
+
+def track_frame(job):
+    camera_id = job.camera_id
+    tracker = trackers[camera_id]
+    flow = flow_trackers.get(camera_id)
+    if job.propagate:
+        if flow is not None:
+            tracker.move(flow.propagate(job.gray, tracker.active()[1]))
+        object_ids, points = tracker.active()
+    else:
+        object_ids, points = tracker.update(centroids(job.detections))
+        if flow is not None:
+            flow.reset(job.gray)
+    # tracker arrays are reused by the next frame while this one is annotated
+    job.points = points.copy()
+
+    # a coasting Kalman track has no detection behind its position, it is
+    # left out of counting and its trajectory until it is matched again, so
+    # a crossing is counted from its last observed position
+    observed = tracker.observed()
+    previous = trajectories[camera_id].record(object_ids[observed], points[observed])
+    entries, exits = job.geometry.count(previous, points[observed])
+    counts = feature_counts[camera_id]
+    for name, entered, exited in zip(job.geometry.names, entries.tolist(), exits.tolist()):
+        if not entered and not exited:
+            continue
+        feature = counts.setdefault(name, {"entry": 0, "exit": 0})
+        feature["entry"] += entered
+        feature["exit"] += exited
+    # a zone drawn around a door line would count the same person twice, so
+    # the camera total and its Detection rows come from the lines only; zones
+    # count towards it only on a camera without lines
+    counted = slice(0, job.geometry.line_count) if job.geometry.line_count else slice(None)
+    total_entered = int(entries[counted].sum())
+    total_exited = int(exits[counted].sum())
+    entry_exit_count[camera_id]["entry"] += total_entered
+    entry_exit_count[camera_id]["exit"] += total_exited
+
+    # a camera process publishes its counts through the frame ring instead
+    if not in_camera_process:
+        report_counts(camera_id, total_entered, total_exited)
+    return job
+
+
+def report_counts(camera_id, entered, exited):
+    for _ in range(entered):
+        save_detection(camera_id, True)
+    for _ in range(exited):
+        save_detection(camera_id, False)
+
     socketio.emit("people_count", {
         "camera_id": camera_id,
         "entry": entry_exit_count[camera_id]["entry"],
-        "exit": entry_exit_count[camera_id]["exit"]
+        "exit": entry_exit_count[camera_id]["exit"],
+        "features": feature_counts[camera_id]
     })
-    cv2.line(frame, (line_position, 0), (line_position, frame.shape[0]), (0, 0, 255), 2)
-    frame = detector.draw_detections(frame, detections)
+
+
+def annotate_frame(job):
+    frame = job.frame
+    for center in job.points.astype(int).tolist():
+        cv2.circle(frame, tuple(center), 4, (255, 0, 0), -1)
+    job.geometry.draw(frame)
+    job.frame = detector.draw_detections(frame, job.detections)
+    return job
+
+
+def finish_frame(job):
+    controller = budget_controllers.get(job.camera_id)
+    if controller is not None:
+        controller.record(sum(job.timings.values()))
+    for name, seconds in job.timings.items():
+        stage_seconds.observe(seconds, job.camera_id, name)
+    return job
+
+
+def timed(name, func):
+    def stage(job):
+        session = profiler.active(job.camera_id)
+        start = time.perf_counter()
+        result = func(job) if session is None else session.run(func, job)
+        job.timings[name] = time.perf_counter() - start
+        return result
+    return stage
+
+
+FRAME_STAGES = [
+    ('preprocess', timed('preprocess', preprocess_frame)),
+    ('detect', timed('detect', detect_frame)),
+    ('track', timed('track', track_frame)),
+    ('annotate', timed('annotate', annotate_frame)),
+]
+
+
+def process_frame(frame, camera_id, detection_enabled=True):
+    if frame is None:
+        return frame
     
-    return frame
+    job = FrameJob(camera_id, frame, detection_enabled)
+    for _, stage in FRAME_STAGES:
+        stage(job)
+    finish_frame(job)
+    return job.frame
 
 
 def offline_frame(camera_id):
-    frame = np.zeros((480, 640, 3), np.uint8)
-    cv2.putText(frame, f'Camera {camera_id} Offline',
-                (100, 250), cv2.FONT_HERSHEY_SIMPLEX,
-                1, (255, 255, 255), 2)
+    frame = offline_frames.get(camera_id)
+    if frame is None:
+        frame = np.zeros((480, 640, 3), np.uint8)
+        cv2.putText(frame, f'Camera {camera_id} Offline',
+                    (100, 250), cv2.FONT_HERSHEY_SIMPLEX,
+                    1, (255, 255, 255), 2)
+        frame.flags.writeable = False
+        offline_frames[camera_id] = frame
     return frame
 
 
 async def create_offer(camera_id, rtsp_url, socket_id):
     camera_id = str(camera_id)
     if not frame_manager.is_running(camera_id):
-        camera = Camera.query.get(int(camera_id))
-        video_file = camera.video_file if camera else None
-        frame_manager.start_camera(camera_id, rtsp_url, video_file)
+        start_camera_for(camera_id, Camera.query.get(int(camera_id)), rtsp_url)
     else:
         print(f"processing for camera {camera_id}")
     pc = RTCPeerConnection()
     camera_clients[camera_id][socket_id] = pc
-    track = CameraVideoTrack(camera_id)
-    pc.addTrack(track)
+    if Config.WEBRTC_BROADCAST:
+        track = broadcaster(camera_id).subscribe()
+        transceiver = pc.addTransceiver(track, direction="sendonly")
+        prefer_h264(transceiver)
+        track.attach(transceiver.sender)
+    else:
+        track = CameraVideoTrack(camera_id)
+        pc.addTrack(track)
     video_tracks[socket_id] = track
     
     offer = await pc.createOffer()
@@ -304,12 +819,42 @@ async def close_connection(camera_id, socket_id):
         except:
             pass
     if camera_id in camera_clients and len(camera_clients[camera_id]) == 0:
-        frame_manager.stop_camera(camera_id)
+        # supervised cameras keep counting without viewers
+        if camera_id not in frame_manager.pinned:
+            frame_manager.stop_camera(camera_id)
         del camera_clients[camera_id]
     else:
         remaining = len(camera_clients.get(camera_id, {}))
 
 
+def start_camera_for(camera_id, camera, rtsp_url=None):
+    camera_id = str(camera_id)
+    try:
+        set_counting_geometry(camera_id, camera.counting_geometry if camera else None)
+    except ValueError as e:
+        print(f"Invalid counting geometry for camera {camera_id}: {e}")
+    scheduler.register(camera_id, camera.priority if camera else 0)
+    frame_manager.start_camera(
+        camera_id,
+        rtsp_url or (camera.rtsp_url if camera else None),
+        camera.video_file if camera else None,
+        camera.detector_backend if camera else None
+    )
+
+
+def broadcaster(camera_id):
+    # every viewer of a camera shares one encoder, the last one to leave stops it
+    if camera_id not in broadcasters:
+        broadcasters[camera_id] = CameraBroadcaster(
+            camera_id, frame_manager, to_video_frame,
+            Config.BROADCAST_BITRATE, Config.BROADCAST_KEYFRAME_INTERVAL, Config.TRACK_IDLE_RESEND,
+            on_idle=lambda b: broadcasters.pop(b.camera_id, None),
+            on_sent=record_send_latency,
+            keyframe_min_interval=Config.BROADCAST_KEYFRAME_MIN_INTERVAL
+        )
+    return broadcasters[camera_id]
+
+
 def client_count(camera_id):
     camera_id = str(camera_id)
     return len(camera_clients.get(camera_id, {}))
@@ -318,9 +863,20 @@ def client_count(camera_id):
 def all_connections():
     result = {}
     for cam_id, clients in camera_clients.items():
+        # the capture thread drops these when the camera stops
+        pipeline = frame_manager.pipelines.get(cam_id)
+        connection = frame_manager.connections.get(cam_id)
         result[cam_id] = {
             'client_count': len(clients),
             'clients': list(clients.keys()),
-            'camera_running': frame_manager.is_running(cam_id)
+            'camera_running': frame_manager.is_running(cam_id),
+            'motion': motion_gates[cam_id].stats() if cam_id in motion_gates else None,
+            'budget': budget_controllers[cam_id].stats() if cam_id in budget_controllers else None,
+            'trajectories': trajectories[cam_id].stats() if cam_id in trajectories else None,
+            'pipeline': pipeline.stats() if pipeline is not None else None,
+            'process': frame_manager.process_stats(cam_id),
+            'broadcast': broadcasters[cam_id].stats() if cam_id in broadcasters else None,
+            'scheduler': scheduler.stats(cam_id),
+            'connection': connection.stats() if connection is not None else None
         }
     return result
@@ -1,7 +1,7 @@
 import asyncio
 import threading
 import logging
-from flask import Flask, redirect, url_for
+from flask import Flask, Response, redirect, url_for
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager
 from flask_socketio import SocketIO
@@ -49,6 +49,13 @@ def create_app():
     from Apps.Auth.routes import auth
     from Apps.humanDetection.routes import detection
     from Apps.humanDetection import websocket_routes
+    from Apps.humanDetection.metrics import render
+    from Apps.humanDetection.detection_writer import detection_writer
+    detection_writer.init_app(app)
+
+    @app.route('/metrics')
+    def metrics():
+        return Response(render(), mimetype='text/plain; version=0.0.4')
 
     app.register_blueprint(auth, url_prefix='/auth')
     app.register_blueprint(detection, url_prefix='/detection')
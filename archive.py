@@ -0,0 +1,18 @@
+import argparse
+from app import create_app
+from config import Config
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Move old detections into per-camera, per-day csv.gz archives")
+    parser.add_argument("--days", type=int, default=Config.DETECTION_RETENTION_DAYS,
+                        help="keep this many days of detections in the database")
+    parser.add_argument("--directory", default=Config.ARCHIVE_DIR)
+    parser.add_argument("--batch", type=int, default=Config.RETENTION_BATCH, help="rows moved per transaction")
+    args = parser.parse_args()
+    if args.days <= 0:
+        parser.error("give --days or set DETECTION_RETENTION_DAYS")
+
+    app = create_app()
+    from Apps.humanDetection.retention import RetentionJob
+    archived = RetentionJob(app, args.days, args.directory, batch_size=args.batch).run_once()
+    print(f"Archived {archived} detections")
@@ -0,0 +1,219 @@
+import argparse
+import json
+import os
+import resource
+import tempfile
+import time
+import av
+import cv2
+import numpy as np
+from config import Config
+
+# the quality controller reacts to wall-clock time, replays must not depend on it
+Config.FRAME_BUDGET_FPS = 0
+
+from Apps.humanDetection import webrtc_service as ws
+from Apps.humanDetection.decoder import PyAVSource
+
+LINE_X = 300
+LANES = (250, 465)
+
+
+def draw_figure(frame, x, bottom, height, phase, color=(50, 50, 60)):
+    # stick figure proportioned so the default HOG people detector finds it
+    s = height / 200.0
+    p = lambda a, b: (int(x + a * s), int(bottom + b * s))
+    swing = 14 * np.sin(phase)
+    cv2.circle(frame, p(0, -172), int(14 * s), color, -1)
+    cv2.line(frame, p(0, -150), p(0, -80), color, int(34 * s))
+    cv2.line(frame, p(-14, -145), p(-17 - swing, -75), color, int(8 * s))
+    cv2.line(frame, p(14, -145), p(17 + swing, -75), color, int(8 * s))
+    cv2.line(frame, p(-5, -80), p(-8 - swing, 0), color, int(14 * s))
+    cv2.line(frame, p(5, -80), p(8 + swing, 0), color, int(14 * s))
+
+
+def synthesize(path, people, frames, seed, fps=25):
+    # people walk across one of two lanes, left to right is an entry as with
+    # the default counting line; returns the ground truth
+    rng = np.random.default_rng(seed)
+    walkers = []
+    for i in range(people):
+        direction = rng.choice((-1, 1))
+        speed = rng.uniform(3.0, 6.0)
+        walkers.append({
+            'start': int(rng.integers(0, max(1, frames - 640 / speed))),
+            'lane': LANES[i % len(LANES)],
+            'x0': -40 if direction > 0 else 680,
+            'velocity': direction * speed,
+            'height': rng.uniform(170, 195),
+        })
+
+    container = av.open(path, 'w')
+    stream = container.add_stream('libx264', rate=fps)
+    stream.width, stream.height, stream.pix_fmt = 640, 480, 'yuv420p'
+    stream.options = {'g': str(fps * 2)}
+    background = np.clip(170 + rng.normal(0, 6, (480, 640, 1)), 0, 255).astype(np.uint8).repeat(3, axis=2)
+    entries = exits = 0
+    for index in range(frames):
+        frame = background.copy()
+        for walker in walkers:
+            step = index - walker['start']
+            if step < 0:
+                continue
+            x = walker['x0'] + walker['velocity'] * step
+            previous = x - walker['velocity']
+            if step > 0 and (previous - LINE_X) * (x - LINE_X) <= 0 and previous != LINE_X:
+                if walker['velocity'] > 0:
+                    entries += 1
+                else:
+                    exits += 1
+            draw_figure(frame, x, walker['lane'], walker['height'], step * 0.4)
+        for packet in stream.encode(av.VideoFrame.from_ndarray(frame, format='bgr24')):
+            container.mux(packet)
+    for packet in stream.encode():
+        container.mux(packet)
+    container.close()
+    return {'entries': entries, 'exits': exits}
+
+
+def load_truth(path):
+    # ground truth for a local clip lives next to it as <clip>.json
+    annotation = path + '.json'
+    if not os.path.exists(annotation):
+        return None
+    with open(annotation) as f:
+        return json.load(f)
+
+
+def replay(path, camera_id, timings):
+    source = PyAVSource(path, threads=1)
+    frames = 0
+    start = time.perf_counter()
+    try:
+        while True:
+            decode_start = time.perf_counter()
+            ret, image = source.read()
+            if not ret:
+                break
+            timings['decode'].append(time.perf_counter() - decode_start)
+            job = ws.FrameJob(camera_id, image)
+            for name, stage in ws.FRAME_STAGES:
+                stage(job)
+                timings[name].append(job.timings[name])
+            frames += 1
+    finally:
+        source.release()
+    elapsed = time.perf_counter() - start
+    counts = ws.entry_exit_count.get(camera_id, {'entry': 0, 'exit': 0})
+    ws.clear_camera_state(camera_id)
+    return frames, elapsed, counts
+
+
+def percentiles(samples):
+    samples = np.asarray(samples) * 1000
+    if len(samples) == 0:
+        return None
+    return {
+        'mean_ms': round(float(samples.mean()), 3),
+        'p50_ms': round(float(np.percentile(samples, 50)), 3),
+        'p95_ms': round(float(np.percentile(samples, 95)), 3),
+        'p99_ms': round(float(np.percentile(samples, 99)), 3),
+    }
+
+
+def run(clips):
+    # counts stay in the replay instead of going to the database and socket
+    ws.in_camera_process = True
+    ws.engine = None
+    timings = {name: [] for name in ['decode'] + [name for name, _ in ws.FRAME_STAGES]}
+    results = []
+    total_frames = 0
+    total_time = 0.0
+    for index, (name, path, truth) in enumerate(clips):
+        frames, elapsed, counts = replay(path, f'bench-{index}', timings)
+        total_frames += frames
+        total_time += elapsed
+        result = {'clip': name, 'frames': frames, 'fps': round(frames / elapsed, 1) if elapsed else 0.0,
+                  'entries': counts['entry'], 'exits': counts['exit']}
+        if truth is not None:
+            result['expected_entries'] = truth['entries']
+            result['expected_exits'] = truth['exits']
+            result['count_error'] = abs(counts['entry'] - truth['entries']) + abs(counts['exit'] - truth['exits'])
+        results.append(result)
+    return {
+        'clips': results,
+        'fps': round(total_frames / total_time, 1) if total_time else 0.0,
+        'stages': {name: percentiles(samples) for name, samples in timings.items()},
+        # ru_maxrss is in kilobytes on Linux
+        'peak_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        'config': {'detector': Config.DETECTOR_BACKEND, 'tracker': Config.TRACKER_MODE,
+                   'detection_interval': Config.DETECTION_INTERVAL, 'motion_gate': Config.MOTION_GATE},
+    }
+
+
+def compare(result, baseline, tolerance):
+    regressions = []
+    if result['fps'] < baseline['fps'] * (1 - tolerance):
+        regressions.append(f"fps {result['fps']} < baseline {baseline['fps']}")
+    for name, stats in result['stages'].items():
+        reference = baseline.get('stages', {}).get(name)
+        if stats and reference and stats['p95_ms'] > reference['p95_ms'] * (1 + tolerance):
+            regressions.append(f"{name} p95 {stats['p95_ms']}ms > baseline {reference['p95_ms']}ms")
+    reference_clips = {clip['clip']: clip for clip in baseline.get('clips', [])}
+    for clip in result['clips']:
+        reference = reference_clips.get(clip['clip'])
+        if reference and clip.get('count_error', 0) > reference.get('count_error', 0):
+            regressions.append(f"{clip['clip']} count error {clip['count_error']} > baseline {reference['count_error']}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay clips through the full frame pipeline without pacing")
+    parser.add_argument('videos', nargs='*', help="local clips, ground truth is read from <clip>.json if present")
+    parser.add_argument('--synthetic', type=int, default=0, help="number of generated walking-figure clips")
+    parser.add_argument('--people', type=int, default=6)
+    parser.add_argument('--frames', type=int, default=300)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help="write the results as JSON")
+    parser.add_argument('--baseline', help="compare against a previous --output file")
+    parser.add_argument('--tolerance', type=float, default=0.15)
+    args = parser.parse_args()
+
+    cv2.setNumThreads(1)
+    workdir = tempfile.TemporaryDirectory()
+    clips = [(os.path.basename(path), path, load_truth(path)) for path in args.videos]
+    for i in range(args.synthetic):
+        path = os.path.join(workdir.name, f'synthetic-{args.seed + i}.mp4')
+        truth = synthesize(path, args.people, args.frames, args.seed + i)
+        clips.append((os.path.basename(path), path, truth))
+    if not clips:
+        parser.error("give video files or --synthetic N")
+
+    result = run(clips)
+    workdir.cleanup()
+
+    print(f"{'clip':>24} {'frames':>7} {'fps':>7} {'entries':>8} {'exits':>6} {'truth':>8} {'error':>6}")
+    for clip in result['clips']:
+        truth = f"{clip['expected_entries']}/{clip['expected_exits']}" if 'count_error' in clip else '-'
+        print(f"{clip['clip']:>24} {clip['frames']:>7} {clip['fps']:>7} {clip['entries']:>8} {clip['exits']:>6} "
+              f"{truth:>8} {clip.get('count_error', '-'):>6}")
+    print(f"\n{'stage':>12} {'mean ms':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for name, stats in result['stages'].items():
+        if stats:
+            print(f"{name:>12} {stats['mean_ms']:>9} {stats['p50_ms']:>9} {stats['p95_ms']:>9} {stats['p99_ms']:>9}")
+    print(f"\nsustained fps {result['fps']}, peak rss {result['peak_rss_mb']} MB")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(result, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(result, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+import argparse
+import time
+import numpy as np
+from Apps.humanDetection.centroid_tracker import CentroidTracker
+from Apps.humanDetection.kalman_tracker import KalmanTracker
+
+TRACKERS = {'centroid': CentroidTracker, 'kalman': KalmanTracker}
+
+
+def simulate(people, frames, rng, width=640, height=480, miss_rate=0.05, noise=2.0):
+    positions = rng.uniform((0, 0), (width, height), size=(people, 2))
+    velocities = rng.normal(0, 4, size=(people, 2))
+    for _ in range(frames):
+        positions = (positions + velocities) % (width, height)
+        seen = rng.random(people) > miss_rate
+        yield positions[seen] + rng.normal(0, noise, size=(int(seen.sum()), 2))
+
+
+def run(people, frames, mode, matching, max_distance, seed):
+    rng = np.random.default_rng(seed)
+    tracker = TRACKERS[mode](max_disappeared=15, max_distance=max_distance, matching=matching)
+    timings = []
+    for points in simulate(people, frames, rng):
+        start = time.perf_counter()
+        tracker.update(points)
+        timings.append(time.perf_counter() - start)
+    # the first update only registers objects
+    timings = np.array(timings[1:]) * 1e6
+    return {
+        'people': people,
+        'mode': mode,
+        'matching': matching,
+        'mean_us': timings.mean(),
+        'p50_us': np.percentile(timings, 50),
+        'p99_us': np.percentile(timings, 99),
+        'tracks': len(tracker),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="CentroidTracker.update latency benchmark")
+    parser.add_argument('--people', type=int, nargs='+', default=[10, 50, 100, 200])
+    parser.add_argument('--frames', type=int, default=500)
+    parser.add_argument('--mode', nargs='+', default=['centroid', 'kalman'], choices=list(TRACKERS))
+    parser.add_argument('--matching', nargs='+', default=['greedy', 'hungarian'])
+    parser.add_argument('--max-distance', type=float, default=50)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    print(f"{'people':>7} {'mode':>9} {'matching':>10} {'mean us':>10} {'p50 us':>10} {'p99 us':>10} {'tracks':>7}")
+    for mode in args.mode:
+        for matching in args.matching:
+            for people in args.people:
+                result = run(people, args.frames, mode, matching, args.max_distance, args.seed)
+                print(f"{result['people']:>7} {result['mode']:>9} {result['matching']:>10} {result['mean_us']:>10.1f} "
+                      f"{result['p50_us']:>10.1f} {result['p99_us']:>10.1f} {result['tracks']:>7}")
+
+
+if __name__ == '__main__':
+    main()
@@ -6,4 +6,60 @@ load_dotenv()
 class Config:
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'insecure-4n48u*ft^$7i1dx9^2@!2a(=k2=8fv2otbj2q$!q2w0k9(pz'
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or 'sqlite:///app.db'
-    SQLALCHEMY_TRACK_MODIFICATIONS = False
\ No newline at end of file
+    SQLALCHEMY_TRACK_MODIFICATIONS = False
+    DETECTION_WORKERS = int(os.environ.get('DETECTION_WORKERS', 0))
+    DETECTION_TIMEOUT = float(os.environ.get('DETECTION_TIMEOUT', 5.0))
+    MOTION_GATE = os.environ.get('MOTION_GATE', '1') == '1'
+    COUNTING_BAND = int(os.environ.get('COUNTING_BAND', 0))
+    DETECTOR_BACKEND = os.environ.get('DETECTOR_BACKEND', 'hog')
+    DETECTOR_OPTIONS = {
+        'dnn': {
+            'model': os.environ.get('DNN_MODEL', 'models/MobileNetSSD_deploy.caffemodel'),
+            'config': os.environ.get('DNN_CONFIG', 'models/MobileNetSSD_deploy.prototxt'),
+            'input_size': (int(os.environ.get('DNN_INPUT_SIZE', 300)),) * 2,
+            'person_class': int(os.environ.get('DNN_PERSON_CLASS', 15)),
+            'threshold': float(os.environ.get('DNN_CONFIDENCE', 0.5)),
+        },
+    }
+    DETECTION_INTERVAL = int(os.environ.get('DETECTION_INTERVAL', 1))
+    DETECTION_CROWD_STEP = int(os.environ.get('DETECTION_CROWD_STEP', 4))
+    FRAME_BUDGET_FPS = float(os.environ.get('FRAME_BUDGET_FPS', 0))
+    FRAME_BUDGET_CPU = float(os.environ.get('FRAME_BUDGET_CPU', 0.6))
+    TRACKER_MATCHING = os.environ.get('TRACKER_MATCHING', 'greedy')
+    TRACKER_MAX_DISTANCE = float(os.environ.get('TRACKER_MAX_DISTANCE', 150))
+    TRACKER_MODE = os.environ.get('TRACKER_MODE', 'centroid')
+    TRAJECTORY_HISTORY = int(os.environ.get('TRAJECTORY_HISTORY', 32))
+    PIPELINE_QUEUE_SIZE = int(os.environ.get('PIPELINE_QUEUE_SIZE', 1))
+    PIPELINE_DROP_POLICY = os.environ.get('PIPELINE_DROP_POLICY', 'drop_oldest')
+    CAMERA_EXECUTION = os.environ.get('CAMERA_EXECUTION', 'thread')
+    FRAME_RING_SLOTS = int(os.environ.get('FRAME_RING_SLOTS', 3))
+    DECODER_BACKEND = os.environ.get('DECODER_BACKEND', 'pyav')
+    DECODER_THREADS = int(os.environ.get('DECODER_THREADS', 0))
+    DECODER_KEYFRAME_AFTER = int(os.environ.get('DECODER_KEYFRAME_AFTER', 30))
+    TRACK_IDLE_RESEND = float(os.environ.get('TRACK_IDLE_RESEND', 1.0))
+    WEBRTC_BROADCAST = os.environ.get('WEBRTC_BROADCAST', '1') == '1'
+    BROADCAST_BITRATE = int(os.environ.get('BROADCAST_BITRATE', 1000000))
+    BROADCAST_KEYFRAME_INTERVAL = float(os.environ.get('BROADCAST_KEYFRAME_INTERVAL', 2.0))
+    BROADCAST_KEYFRAME_MIN_INTERVAL = float(os.environ.get('BROADCAST_KEYFRAME_MIN_INTERVAL', 0.5))
+    CPU_BUDGET = float(os.environ.get('CPU_BUDGET', 0.75))
+    DETECTION_SLOTS = int(os.environ.get('DETECTION_SLOTS', 0))
+    DETECTION_SLOT_WAIT = float(os.environ.get('DETECTION_SLOT_WAIT', 0.5))
+    SUPERVISOR_INTERVAL = float(os.environ.get('SUPERVISOR_INTERVAL', 10))
+    OPEN_TIMEOUT = float(os.environ.get('OPEN_TIMEOUT', 10))
+    READ_TIMEOUT = float(os.environ.get('READ_TIMEOUT', 5))
+    RECONNECT_BASE_DELAY = float(os.environ.get('RECONNECT_BASE_DELAY', 0.5))
+    RECONNECT_MAX_DELAY = float(os.environ.get('RECONNECT_MAX_DELAY', 30))
+    STALL_TIMEOUT = float(os.environ.get('STALL_TIMEOUT', 10))
+    ANALYSIS_WORKERS = int(os.environ.get('ANALYSIS_WORKERS', 0))
+    ANALYSIS_SEGMENT = float(os.environ.get('ANALYSIS_SEGMENT', 60))
+    ANALYSIS_WARMUP = float(os.environ.get('ANALYSIS_WARMUP', 5))
+    PROFILE_DIR = os.environ.get('PROFILE_DIR', 'profiles')
+    PROFILE_MAX_SECONDS = float(os.environ.get('PROFILE_MAX_SECONDS', 300))
+    DETECTION_WRITER_QUEUE = int(os.environ.get('DETECTION_WRITER_QUEUE', 10000))
+    DETECTION_WRITER_BATCH = int(os.environ.get('DETECTION_WRITER_BATCH', 200))
+    DETECTION_WRITER_INTERVAL = float(os.environ.get('DETECTION_WRITER_INTERVAL', 1.0))
+    ROLLUP_MAX_POINTS = int(os.environ.get('ROLLUP_MAX_POINTS', 500))
+    DETECTION_RETENTION_DAYS = int(os.environ.get('DETECTION_RETENTION_DAYS', 0))
+    ARCHIVE_DIR = os.environ.get('ARCHIVE_DIR', 'archive')
+    RETENTION_BATCH = int(os.environ.get('RETENTION_BATCH', 5000))
+    RETENTION_INTERVAL = float(os.environ.get('RETENTION_INTERVAL', 3600))
@@ -2,4 +2,6 @@ from app import create_app, socketio
 
 if __name__ == "__main__":
     app = create_app()
+    from Apps.humanDetection.retention import start_retention
+    start_retention(app)
     socketio.run(app, host="127.0.0.1", port=5001)
@@ -0,0 +1,24 @@
+import argparse
+from app import create_app, socketio
+from config import Config
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run every active camera continuously, with or without viewers")
+    parser.add_argument("--headless", action="store_true", help="run the analytics only, without the web server")
+    parser.add_argument("--interval", type=float, default=Config.SUPERVISOR_INTERVAL,
+                        help="seconds between refreshes of the active camera list")
+    args = parser.parse_args()
+
+    app = create_app()
+    from Apps.humanDetection.supervisor import CameraSupervisor
+    from Apps.humanDetection.retention import start_retention
+    start_retention(app)
+    supervisor = CameraSupervisor(app, args.interval)
+    if args.headless:
+        try:
+            supervisor.run()
+        except KeyboardInterrupt:
+            pass
+    else:
+        supervisor.start()
+        socketio.run(app, host="127.0.0.1", port=5001)